@@ -0,0 +1,178 @@
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from export import Playlist, clock, format_for, timeline, write_file
+from library import DB_PATH, load_library
+from planner import build_harmonic_graph_setlist
+from scoring import score_library
+from transitions import get_transition_store
+from vibes import get_profile
+from worker_pool import SharedTablePool
+
+Job = namedtuple("Job", ["name", "start", "end", "vibe", "auto", "seed", "engine"])
+OUTPUT_FIELDS = ["job", "position", "time", "track_title", "artist", "bpm", "key", "genre"]
+
+# Set once per worker by init_worker; read-only afterwards
+_TABLE = None
+_FRAME = None
+_TRANSITIONS = None
+
+
+# --- Job File ---
+def read_jobs(path):
+    """Jobs from a CSV with columns start, end, vibe[, segmentation, seed, name, engine].
+
+    Blank lines and lines starting with '#' are skipped. segmentation is
+    "auto" (default) or "manual"; a missing seed is the job's line number.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        lines = [line for line in f if line.strip() and not line.lstrip().startswith("#")]
+    jobs = []
+    for i, row in enumerate(csv.DictReader(lines), 1):
+        row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+        missing = [c for c in ("start", "end", "vibe") if not row.get(c)]
+        if missing:
+            raise ValueError(f"{path}: job {i} is missing {', '.join(missing)}")
+        segmentation = row.get("segmentation") or "auto"
+        if segmentation not in ("auto", "manual"):
+            raise ValueError(f"{path}: job {i} has segmentation '{segmentation}', expected auto or manual")
+        jobs.append(Job(
+            name=row.get("name") or f"job{i}",
+            start=row["start"],
+            end=row["end"],
+            vibe=row["vibe"],
+            auto=segmentation == "auto",
+            seed=int(row["seed"]) if row.get("seed") else i,
+            engine=row.get("engine") or "dp",
+        ))
+    return jobs
+
+
+def set_window(job):
+    start_time = datetime.strptime(job.start, "%H:%M")
+    end_time = datetime.strptime(job.end, "%H:%M")
+    if end_time <= start_time:
+        end_time += timedelta(days=1)
+    return start_time, end_time
+
+
+# --- Workers ---
+def init_worker(table, transitions):
+    """Pool initializer, run once per worker process with the shared table."""
+    global _TABLE, _FRAME, _TRANSITIONS
+    _TABLE = table
+    # score_library only reads bpm and genre; rebuilt here from the table once per worker
+    _FRAME = pd.DataFrame({
+        "bpm": table.bpm.astype("float64"),
+        "genre": [table.genres[g] if g >= 0 else None for g in table.genre_id.tolist()],
+    })
+    _TRANSITIONS = transitions
+
+
+def plan_job(job, positions=None):
+    """(start time, mix ratio, setlist) for one job, planned in a worker set up by init_worker.
+
+    Only the table rows at `positions` (Library.candidate_positions for the
+    job's vibe) are scored and planned; every row when None. The result
+    depends only on the job's seed, not on the worker.
+    """
+    start_time, end_time = set_window(job)
+    mix_ratio = get_profile(job.vibe).mix_ratio
+    table, frame = _TABLE, _FRAME
+    if positions is not None:
+        table, frame = table.take(positions), frame.iloc[positions]
+    scored = table.with_scores(score_library(frame, job.vibe, rng=random.Random(job.seed)))
+    random.seed(job.seed)
+    setlist = build_harmonic_graph_setlist(
+        scored, (end_time - start_time).total_seconds(), job.auto, _TRANSITIONS, mix_ratio, job.engine
+    )
+    return start_time, mix_ratio, setlist
+
+
+def run_jobs(jobs, library, transitions=None, workers=None):
+    """A Playlist for every job, in job order, planned on a pool of `workers` processes.
+
+    The table goes into shared memory once and every worker attaches to
+    it, so the library is loaded and interned once for the whole batch.
+    Each vibe's candidate rows are selected once, here.
+    """
+    table = library.table
+    candidates = {vibe: library.candidate_positions(vibe) for vibe in {job.vibe for job in jobs}}
+    positions = [candidates[job.vibe] for job in jobs]
+    workers = min(workers or os.cpu_count() or 1, len(jobs)) or 1
+    if workers == 1:
+        init_worker(table, transitions)
+        planned = [plan_job(job, p) for job, p in zip(jobs, positions)]
+    else:
+        with SharedTablePool(workers, table, init_worker, (transitions,)) as pool:
+            planned = list(pool.map(plan_job, jobs, positions))
+    return [Playlist(job.name, setlist, start_time, mix_ratio) for job, (start_time, mix_ratio, setlist) in zip(jobs, planned)]
+
+
+# --- Output ---
+def _rows(playlist):
+    for entry in timeline(playlist):
+        yield {
+            "job": playlist.name,
+            "position": entry.position,
+            "time": clock(entry.starts_at),
+            **{f: entry.track.get(f) for f in OUTPUT_FIELDS[3:]},
+        }
+
+
+def write_results(path, jobs, playlists):
+    """Write every set to `path`: .json, .m3u8, rekordbox .xml (one playlist per job) or CSV rows."""
+    if path.endswith(".json"):
+        payload = [dict(job._asdict(), setlist=list(_rows(p))) for job, p in zip(jobs, playlists)]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+        return
+    fmt = format_for(path)
+    if fmt in ("m3u8", "rekordbox"):
+        write_file(path, playlists, fmt)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS)
+        writer.writeheader()
+        for playlist in playlists:
+            writer.writerows(_rows(playlist))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate one setlist per line of a job file.")
+    parser.add_argument("jobs", help="CSV with start,end,vibe[,segmentation,seed,name,engine] per line")
+    parser.add_argument("-o", "--out", default="batch_setlists.csv", help="output .csv, .json, .m3u8 or rekordbox .xml")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    jobs = read_jobs(args.jobs)
+    if not jobs:
+        sys.exit(f"{args.jobs} has no jobs")
+
+    start = time.perf_counter()
+    library = load_library(args.db)
+    loaded = time.perf_counter()
+    playlists = run_jobs(jobs, library, get_transition_store(), args.workers)
+    planned = time.perf_counter()
+    write_results(args.out, jobs, playlists)
+    written = time.perf_counter()
+
+    plan_seconds = planned - loaded
+    print(f"Loaded {len(library.df)} tracks in {loaded - start:.2f}s")
+    print(f"Planned {len(jobs)} sets in {plan_seconds:.2f}s "
+          f"({len(jobs) / max(plan_seconds, 1e-9):.1f} sets/sec)")
+    print(f"Wrote {sum(len(p.tracks) for p in playlists)} tracks to {args.out} in {written - planned:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
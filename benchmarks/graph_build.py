@@ -0,0 +1,73 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from harmonic_index import HarmonicIndex
+from planner import get_harmonic_neighbors
+
+LEGACY_LIMIT = 2000
+SIZES = [500, 1000, 2000, 5000, 10000, 20000]
+
+
+def synthetic_tracks(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "track_title": f"Track {i}",
+            "artist": f"Artist {i % 500}",
+            "bpm": round(rng.gauss(122, 12), 2),
+            "key": f"{rng.randint(1, 12)}{rng.choice('AB')}",
+        }
+        for i in range(n)
+    ]
+
+
+# Old path: every pair, compared through the neighbour key names
+def legacy_edges(tracks):
+    n = len(tracks)
+    graph = [[] for _ in range(n)]
+    for i in range(n):
+        key1 = tracks[i]['key'].strip().upper()
+        bpm1 = tracks[i]['bpm']
+        for j in range(n):
+            if i == j:
+                continue
+            key2 = tracks[j]['key'].strip().upper()
+            bpm2 = tracks[j]['bpm']
+            if key2 in get_harmonic_neighbors(key1) and abs(bpm1 - bpm2) <= 25:
+                graph[i].append(j)
+    return graph
+
+
+def indexed_edges(tracks):
+    index = HarmonicIndex(tracks)
+    return [index.neighbors(i) for i in range(len(tracks))]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    print(f"{'tracks':>8} | {'legacy (s)':>10} | {'index (s)':>10} | {'edges':>10}")
+    print("-" * 48)
+    for n in SIZES:
+        tracks = synthetic_tracks(n)
+        index_time, graph = timed(indexed_edges, tracks)
+        edges = sum(len(g) for g in graph)
+        if n <= LEGACY_LIMIT:
+            legacy_time, legacy_graph = timed(legacy_edges, tracks)
+            assert [sorted(g) for g in legacy_graph] == [sorted(g) for g in graph]
+            legacy_col = f"{legacy_time:10.3f}"
+        else:
+            legacy_col = f"{'skipped':>10}"
+        print(f"{n:>8} | {legacy_col} | {index_time:10.3f} | {edges:>10}")
+
+
+if __name__ == "__main__":
+    main()
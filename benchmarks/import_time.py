@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Modules the CLI imports before its first prompt, and what each may cost.
+# Everything they import (query, genres, vibes, planner, ...) is held to
+# the standard library by the HEAVY check.
+BUDGETS_MS = {"core": 60, "main": 120}
+HEAVY = ("numpy", "pandas", "streamlit")
+
+
+def import_profile(module):
+    """{imported module: cumulative microseconds} from `python -X importtime -c "import module"`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def check(module, repeats=5):
+    # Best of a few runs, so a cold disk cache does not fail the check
+    runs = [import_profile(module) for _ in range(repeats)]
+    heavy = sorted({name for times in runs for name in times if name.split(".")[0] in HEAVY})
+    best_ms = min(times.get(module, 0) for times in runs) / 1000
+    return best_ms, heavy
+
+
+def main():
+    failed = False
+    for module, budget_ms in BUDGETS_MS.items():
+        best_ms, heavy = check(module)
+        ok = best_ms <= budget_ms and not heavy
+        failed |= not ok
+        print(f"{module:>6}: {best_ms:6.1f} ms (budget {budget_ms} ms)"
+              + (f", imports {', '.join(heavy)}" if heavy else "") + ("" if ok else "  FAILED"))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from graph_build import synthetic_tracks
+from harmonic_index import HarmonicIndex
+from path_engine import energy_rank, longest_path
+
+BUDGET = 3 * 3600
+# (tracks, BPM window). At 100k the full +/-25 window is ~1.5 billion edges,
+# so the large run uses a narrow window to keep the graph itself in memory.
+CASES = [(10000, 25), (10000, 2), (100000, 2)]
+
+
+# Old path: one pass in index order, copying the whole path on each relaxation
+def legacy_dp(durations, graph, budget):
+    n = len(durations)
+    dp = [(durations[i], [i]) for i in range(n)]
+    for i in range(n):
+        for j in graph[i]:
+            new_time = dp[i][0] + durations[j]
+            if new_time <= budget and new_time > dp[j][0]:
+                dp[j] = (new_time, dp[i][1] + [j])
+    return max(dp, key=lambda x: (x[0] <= budget, x[0], random.random()))[1]
+
+
+def engine_dp(durations, graph, budget, index):
+    rank = energy_rank(index.bpms, index.camelot_nums())
+    return longest_path(durations, graph, budget, rank)
+
+
+def measure(fn, *args):
+    # Timed and traced separately: tracemalloc slows allocation-heavy code
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    path = fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, path
+
+
+def main():
+    print(f"{'tracks':>7} {'window':>6} {'edges':>10} | {'legacy s':>8} {'MiB':>7} | {'engine s':>8} {'MiB':>7} | repeats")
+    print("-" * 80)
+    for n, window in CASES:
+        random.seed(0)
+        tracks = synthetic_tracks(n)
+        index = HarmonicIndex(tracks, bpm_window=window)
+        graph = [index.neighbors(i) for i in range(n)]
+        rng = random.Random(n)
+        durations = [rng.randint(120, 300) for _ in range(n)]
+        edges = sum(len(g) for g in graph)
+
+        legacy_s, legacy_mib, legacy_path = measure(legacy_dp, durations, graph, BUDGET)
+        engine_s, engine_mib, path = measure(engine_dp, durations, graph, BUDGET, index)
+        repeats = f"{len(legacy_path) - len(set(legacy_path))}/{len(path) - len(set(path))}"
+        print(f"{n:>7} {window:>6} {edges:>10} | {legacy_s:8.2f} {legacy_mib:7.1f} | "
+              f"{engine_s:8.2f} {engine_mib:7.1f} | {repeats}")
+
+
+if __name__ == "__main__":
+    main()
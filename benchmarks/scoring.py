@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scoring import score_library, score_track
+
+GENRES = [
+    "House", "Deep House", "Tech House", "Afro House", "Pop", "Indie Pop", "Rap/HipHop",
+    "Hip-Hop & Rap", "R & B", "Techno", "Trance", "Electronica", "Latin Music", "Rock", None,
+]
+APPLY_ROWS = 20000
+LIBRARY_ROWS = 1000000
+
+
+def synthetic_library(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "bpm": np.round(rng.normal(122, 14, n), 2),
+        "genre": rng.choice(np.array(GENRES, dtype=object), n),
+    })
+
+
+def main():
+    sample = synthetic_library(APPLY_ROWS)
+    for vibe in ["Frat Party", "Sunset"]:
+        random.seed(7)
+        expected = sample.apply(lambda row: score_track(row, vibe), axis=1).to_numpy()
+        random.seed(7)
+        assert np.array_equal(expected, score_library(sample, vibe)), vibe
+
+    start = time.perf_counter()
+    sample.apply(lambda row: score_track(row, "Frat Party"), axis=1)
+    apply_time = time.perf_counter() - start
+
+    library = synthetic_library(LIBRARY_ROWS)
+    start = time.perf_counter()
+    score_library(library, "Frat Party")
+    vector_time = time.perf_counter() - start
+
+    print(f"df.apply(score_track): {APPLY_ROWS:>8} rows in {apply_time:.3f}s "
+          f"(~{apply_time * LIBRARY_ROWS / APPLY_ROWS:.1f}s per 1M)")
+    print(f"score_library:         {LIBRARY_ROWS:>8} rows in {vector_time:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from synthetic import ROOT, write_sqlite, write_txt
+
+import dataloader
+import pandas as pd
+
+from harmonic_index import HarmonicIndex
+from path_engine import energy_rank, longest_path
+from planner import build_harmonic_graph_setlist, play_durations
+from query import load_candidates
+from scoring import score_library
+from track_table import TrackTable
+
+SIZES = [1000, 10000, 100000, 1000000]
+# Graph scenarios hold every edge in memory; at 100k tracks the +/-25 BPM
+# window is over a billion edges, so they stop at this size
+GRAPH_LIMIT = 20000
+SET_SECONDS = 3 * 3600
+VIBE = "Frat Party"
+
+
+# --- Scenarios ---
+# Each takes the shared context and returns (run, extra): run() is the
+# timed work, extra is recorded alongside the timing
+def scenario_import(ctx):
+    txt_dir = os.path.join(ctx["workdir"], f"txt_{ctx['n']}")
+    if not os.path.isdir(txt_dir):
+        os.makedirs(txt_dir)
+        write_txt(os.path.join(txt_dir, "library.txt"), ctx["n"], ctx["seed"])
+
+    def run():
+        fd, path = tempfile.mkstemp(suffix=".db", dir=ctx["workdir"])
+        os.close(fd)
+        with contextlib.closing(dataloader.connect(path)) as conn, contextlib.redirect_stdout(io.StringIO()):
+            dataloader.load_txt_files(txt_dir, conn)
+    return run, {}
+
+
+def scenario_load(ctx):
+    def run():
+        with contextlib.closing(sqlite3.connect(ctx["db"])) as conn:
+            df = pd.read_sql_query("SELECT * FROM tracks", conn)
+        ctx["df"] = df
+        ctx["table"] = TrackTable.from_frame(df)
+    return run, {}
+
+
+def scenario_candidate_load(ctx):
+    # The vibe's candidate rows only, filtered in SQLite
+    extra = {}
+
+    def run():
+        extra["rows"] = len(load_candidates(VIBE, ctx["db"]))
+    return run, extra
+
+
+def scenario_scoring(ctx):
+    def run():
+        random.seed(ctx["seed"])
+        ctx["scores"] = score_library(ctx["df"], VIBE)
+    return run, {}
+
+
+def _segment_graph(table):
+    index = HarmonicIndex.from_arrays(table.key_code.tolist(), table.bpm.tolist())
+    rank = energy_rank(index.bpms, index.camelot_nums())
+    graph = [[j for j in index.neighbors(i) if rank[j] > rank[i]] for i in range(len(table))]
+    return graph, rank
+
+
+def scenario_graph_build(ctx):
+    # One segment-sized problem: every scored track with a key
+    table = ctx["table"].with_scores(ctx["scores"])
+    table = table.take(table.candidate_positions())
+    extra = {}
+
+    def run():
+        ctx["graph"], ctx["rank"] = _segment_graph(table)
+        ctx["durations"] = play_durations(table)
+        extra["edges"] = sum(len(g) for g in ctx["graph"])
+    return run, extra
+
+
+def scenario_path_search(ctx):
+    extra = {}
+
+    def run():
+        path = longest_path(ctx["durations"], ctx["graph"], SET_SECONDS, ctx["rank"])
+        extra["path_tracks"] = len(path)
+    return run, extra
+
+
+def scenario_end_to_end(ctx):
+    extra = {}
+
+    def run():
+        random.seed(ctx["seed"])
+        scored = ctx["table"].with_scores(score_library(ctx["df"], VIBE))
+        setlist = build_harmonic_graph_setlist(scored, SET_SECONDS)
+        extra["set_tracks"] = len(setlist)
+    return run, extra
+
+
+SCENARIOS = [
+    ("import", scenario_import, None),
+    ("load", scenario_load, None),
+    ("candidate_load", scenario_candidate_load, None),
+    ("scoring", scenario_scoring, None),
+    ("graph_build", scenario_graph_build, GRAPH_LIMIT),
+    ("path_search", scenario_path_search, GRAPH_LIMIT),
+    ("end_to_end", scenario_end_to_end, GRAPH_LIMIT),
+]
+
+
+# --- Measurement ---
+def measure(run, memory=True):
+    # Timed and traced separately: tracemalloc slows allocation-heavy code
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak = round(peak / 2**20, 2)
+    return elapsed, peak
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes, seed=0, only=None, memory=True):
+    if only:
+        # Later scenarios read what these leave in the context
+        only = set(only) | {"load", "scoring"} | ({"graph_build"} if "path_search" in only else set())
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in sizes:
+            ctx = {"n": n, "seed": seed, "workdir": workdir, "db": os.path.join(workdir, f"library_{n}.db")}
+            write_sqlite(ctx["db"], n, seed)
+            for name, scenario, limit in SCENARIOS:
+                if only and name not in only:
+                    continue
+                if limit is not None and n > limit:
+                    results.append({"scenario": name, "tracks": n, "skipped": f"over {limit} tracks"})
+                    continue
+                run, extra = scenario(ctx)
+                seconds, peak = measure(run, memory)
+                result = {"scenario": name, "tracks": n, "seconds": round(seconds, 4), "peak_mib": peak, **extra}
+                results.append(result)
+                print(f"{name:>14} {n:>8} tracks  {seconds:9.3f}s  "
+                      f"{'' if peak is None else f'{peak:9.1f} MiB'}", file=sys.stderr)
+    return {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, out=sys.stderr):
+    """Print new/old time ratios for every scenario and size both reports timed."""
+    old = {(r["scenario"], r["tracks"]): r for r in baseline["results"] if "seconds" in r}
+    print(f"{'scenario':>14} {'tracks':>8} | {'old s':>9} {'new s':>9} {'ratio':>6}", file=out)
+    for r in report["results"]:
+        before = old.get((r["scenario"], r["tracks"]))
+        if before is None or "seconds" not in r:
+            continue
+        ratio = r["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        print(f"{r['scenario']:>14} {r['tracks']:>8} | {before['seconds']:9.3f} {r['seconds']:9.3f} {ratio:6.2f}",
+              file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the planning pipeline on synthetic libraries.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=[name for name, _, _ in SCENARIOS],
+                        help="scenarios to run (the ones they depend on run too)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run_suite(args.sizes, args.seed, args.only, not args.no_memory)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
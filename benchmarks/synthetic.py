@@ -0,0 +1,104 @@
+import io
+import os
+import random
+import sys
+from contextlib import closing, redirect_stdout
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "data"))
+
+import dataloader
+
+EXPORT_HEADER = ["#", "Track Title", "Artist", "BPM", "Key", "Album", "Genre", "Rating", "Time", "Date Added"]
+
+# (spellings seen in real exports, share of library, BPM mean/sd, length mean/sd in seconds)
+GENRES = [
+    (["House", "house"], 0.14, 124, 3, 380, 60),
+    (["Deep House"], 0.08, 121, 3, 400, 60),
+    (["Tech House"], 0.08, 126, 2, 370, 50),
+    (["Afro House", "Organic House"], 0.05, 122, 3, 420, 70),
+    (["Techno"], 0.06, 132, 5, 400, 70),
+    (["Trance"], 0.03, 138, 3, 420, 60),
+    (["Electronic", "Electronica", "Dance"], 0.10, 124, 8, 260, 50),
+    (["Pop", "Indie Pop", "Latin Pop"], 0.16, 118, 16, 205, 30),
+    (["Hip Hop", "Rap/HipHop", "hip-hop & rap", "Hip-Hop/Rap"], 0.13, 96, 16, 200, 35),
+    (["R&B", "R & B", "r&b"], 0.06, 95, 12, 215, 35),
+    (["Latin Music", "Reggaeton"], 0.05, 100, 10, 210, 30),
+    (["Rock", "Alternative"], 0.04, 122, 20, 230, 45),
+]
+MISSING_GENRE = 0.05
+MISSING_KEY = 0.01
+MINOR_SHARE = 0.6  # Camelot A keys are more common in dance libraries
+ARTIST_SHARE = 0.1  # distinct artists per track
+CHUNK_ROWS = 20000
+
+
+def synthetic_rows(n, seed=0):
+    """Yield n (title, artist, bpm, key, genre, time) export rows, same for a given seed.
+
+    Genres are drawn by library share, and each genre brings its own BPM
+    and track-length spread. Artists follow a long tail, so a few have
+    many tracks, as in real libraries.
+    """
+    rng = random.Random(seed)
+    weights = [g[1] for g in GENRES]
+    artists = max(int(n * ARTIST_SHARE), 1)
+    for i in range(n):
+        spellings, _, bpm_mean, bpm_sd, length_mean, length_sd = rng.choices(GENRES, weights)[0]
+        genre = None if rng.random() < MISSING_GENRE else rng.choice(spellings)
+        bpm = round(min(max(rng.gauss(bpm_mean, bpm_sd), 60.0), 200.0), 2)
+        if rng.random() < MISSING_KEY:
+            key = None
+        else:
+            key = f"{rng.randint(1, 12)}{'A' if rng.random() < MINOR_SHARE else 'B'}"
+        seconds = int(max(rng.gauss(length_mean, length_sd), 60))
+        artist = f"Artist {int(rng.paretovariate(1.1)) % artists}"
+        yield (f"Synthetic Track {i}", artist, bpm, key, genre, f"{seconds // 60:02d}:{seconds % 60:02d}")
+
+
+def write_txt(path, n, seed=0):
+    """A rekordbox-style export: UTF-16 with a BOM, tab-separated."""
+    with open(path, "w", encoding="utf-16", newline="") as f:
+        f.write("\t".join(EXPORT_HEADER) + "\r\n")
+        for i, (title, artist, bpm, key, genre, track_time) in enumerate(synthetic_rows(n, seed), 1):
+            fields = [str(i), title, artist, f"{bpm:.2f}", key or "", "", genre or "", "", track_time, "2025-01-01"]
+            f.write("\t".join(fields) + "\r\n")
+    return path
+
+
+def write_sqlite(path, n, seed=0):
+    """A dj_tracks.db-shaped database with the same rows write_txt would export."""
+    with closing(dataloader.connect(path)) as conn:
+        dataloader.ensure_schema(conn)
+        insert = '''
+            INSERT INTO tracks (track_title, artist, bpm, key, genre, time, duration_s, row_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        '''
+        chunk = []
+        for row in synthetic_rows(n, seed):
+            # Hashed as the importer would, so re-importing the TXT form changes nothing
+            chunk.append(row + (dataloader.parse_time(row[5]), dataloader.row_hash(row)))
+            if len(chunk) >= CHUNK_ROWS:
+                with conn:
+                    conn.executemany(insert, chunk)
+                chunk = []
+        with conn:
+            conn.executemany(insert, chunk)
+        with redirect_stdout(io.StringIO()):
+            dataloader.backfill_query_columns(conn)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic track library.")
+    parser.add_argument("tracks", type=int)
+    parser.add_argument("path", help="output .db or .txt file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if os.path.exists(args.path):
+        sys.exit(f"{args.path} already exists")
+    (write_txt if args.path.endswith(".txt") else write_sqlite)(args.path, args.tracks, args.seed)
+    print(f"Wrote {args.tracks} tracks to {args.path}")
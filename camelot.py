@@ -0,0 +1,120 @@
+import re
+from functools import lru_cache
+
+NO_KEY = -1
+KEYS = 24  # Camelot 1A..12B as codes 0..23: (num - 1) * 2, plus 1 for B
+
+CAMELOT_PATTERN = re.compile(r"^(\d{1,2})([AB])$")
+MUSICAL_PATTERN = re.compile(r"^([A-G])([#B]?)\s*(M|MIN|MINOR|MAJ|MAJOR)?$")
+
+# Pitch class (C = 0) of each minor and major key's tonic -> Camelot number
+MINOR_NUMBERS = {8: 1, 3: 2, 10: 3, 5: 4, 0: 5, 7: 6, 2: 7, 9: 8, 4: 9, 11: 10, 6: 11, 1: 12}
+MAJOR_NUMBERS = {11: 1, 6: 2, 1: 3, 8: 4, 3: 5, 10: 6, 5: 7, 0: 8, 7: 9, 2: 10, 9: 11, 4: 12}
+PITCHES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+NOTE_NAMES = ("C", "Db", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B")  # as rekordbox spells them
+
+# Kinds of move between two keys, as stored in MOVES
+INCOMPATIBLE, SAME, RELATIVE, ADJACENT, BOOST = range(5)
+BOOST_STEPS = (2, 7)  # energy-boost jumps round the wheel, same mode
+
+
+# --- Codes ---
+def encode(num, mode):
+    return (num - 1) * 2 + (mode == 'B')
+
+
+def decode(code):
+    """(num, mode) for a code, None for NO_KEY."""
+    if code < 0:
+        return None
+    return code // 2 + 1, 'B' if code % 2 else 'A'
+
+
+def key_name(code):
+    return "" if code < 0 else f"{code // 2 + 1}{'B' if code % 2 else 'A'}"
+
+
+@lru_cache(maxsize=4096)
+def normalize_key(key):
+    """Camelot code 0..23 for a key, NO_KEY if it cannot be read.
+
+    Takes Camelot ("8A", " 8a") or musical notation from exports ("Am",
+    "F#m", "Bb", "Db major", "C# minor"). A bare note is major. Library
+    keys repeat heavily, so each distinct string is parsed once.
+    """
+    text = str(key).strip().upper().replace("♯", "#").replace("♭", "B")
+    match = CAMELOT_PATTERN.match(text)
+    if match:
+        num = int(match.group(1))
+        return encode(num, match.group(2)) if 1 <= num <= 12 else NO_KEY
+
+    match = MUSICAL_PATTERN.match(text)
+    if not match:
+        return NO_KEY
+    note, accidental, quality = match.groups()
+    pitch = (PITCHES[note] + {"#": 1, "B": -1}.get(accidental, 0)) % 12
+    if quality in ("M", "MIN", "MINOR"):
+        return encode(MINOR_NUMBERS[pitch], 'A')
+    return encode(MAJOR_NUMBERS[pitch], 'B')
+
+
+def camelot_name(key):
+    """Key in Camelot notation ("Am" -> "8A"); "" if it cannot be read."""
+    return key_name(normalize_key(key))
+
+
+def musical_name(code):
+    """Key in musical notation ("8A" -> "Am"), as DJ software shows it; "" for NO_KEY."""
+    return "" if code < 0 else MUSICAL_NAMES[code]
+
+
+# --- Precomputed Tables ---
+def _musical(code):
+    num, mode = decode(code)
+    numbers = MINOR_NUMBERS if mode == 'A' else MAJOR_NUMBERS
+    pitch = next(p for p, n in numbers.items() if n == num)
+    return NOTE_NAMES[pitch] + ("m" if mode == 'A' else "")
+
+
+def _move(a, b):
+    (num_a, mode_a), (num_b, mode_b) = decode(a), decode(b)
+    step = (num_b - num_a) % 12
+    if mode_a != mode_b:
+        return RELATIVE if step == 0 else INCOMPATIBLE
+    if step == 0:
+        return SAME
+    if step in (1, 11):
+        return ADJACENT
+    if step in BOOST_STEPS:
+        return BOOST
+    return INCOMPATIBLE
+
+
+def _distance(a, b):
+    (num_a, mode_a), (num_b, mode_b) = decode(a), decode(b)
+    steps = abs(num_a - num_b) % 12
+    return min(steps, 12 - steps) + (mode_a != mode_b)
+
+
+# Flat 24 x 24 tables indexed by a * KEYS + b
+MOVES = bytes(_move(a, b) for a in range(KEYS) for b in range(KEYS))
+COMPATIBLE = bytes(MOVES[i] in (SAME, RELATIVE, ADJACENT) for i in range(KEYS * KEYS))
+DISTANCE = bytes(_distance(a, b) for a in range(KEYS) for b in range(KEYS))
+NEIGHBORS = tuple(tuple(b for b in range(KEYS) if COMPATIBLE[a * KEYS + b]) for a in range(KEYS))
+MUSICAL_NAMES = tuple(_musical(code) for code in range(KEYS))
+
+
+def compatible(a, b):
+    """Whether codes a and b mix harmonically: same key, relative, or one step."""
+    return a >= 0 and b >= 0 and COMPATIBLE[a * KEYS + b] == 1
+
+
+def distance(a, b):
+    """Steps round the wheel between codes; a mode switch counts as one."""
+    if a < 0 or b < 0:
+        return 0
+    return DISTANCE[a * KEYS + b]
+
+
+def move(a, b):
+    return MOVES[a * KEYS + b] if a >= 0 and b >= 0 else INCOMPATIBLE
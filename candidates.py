@@ -0,0 +1,112 @@
+import os
+import random
+from collections import namedtuple
+
+import instrument
+from planner import build_harmonic_graph_setlist, estimate_track_duration, is_table
+from transitions import fold, transition_adjacency
+from vibes import DEFAULT_MIX_RATIO
+from worker_pool import SharedTablePool
+
+Candidate = namedtuple("Candidate", ["seed", "score", "setlist"])
+
+DEFAULT_WEIGHTS = {
+    "fill": 1.0,         # share of the requested duration actually played
+    "transitions": 0.5,  # share of adjacent pairs found in the transitions table
+    "smoothness": 0.5,   # 1 - mean BPM jump, scaled to the 25 BPM edge limit
+}
+MAX_BPM_JUMP = 25
+
+# Set once per worker by _init_worker; read-only afterwards
+_TRACKS = None
+_POSITIONS = None
+_TRANSITIONS = None
+
+
+# --- Objective ---
+def setlist_objective(setlist, total_duration_seconds, transitions=None, weights=None, mix_ratio=DEFAULT_MIX_RATIO):
+    weights = weights or DEFAULT_WEIGHTS
+    if not setlist:
+        return 0.0
+
+    played = sum(estimate_track_duration(t, mix_ratio) for t in setlist)
+    fill = min(played / total_duration_seconds, 1.0) if total_duration_seconds > 0 else 0.0
+
+    adjacent = list(zip(setlist, setlist[1:]))
+    recorded = transition_adjacency(
+        transitions, [(fold(t.get('artist')), fold(t.get('track_title'))) for t in setlist]
+    )
+    hits = sum(1 for i in range(len(adjacent)) if i + 1 in recorded.get(i, ()))
+    jumps = sum(min(abs(a['bpm'] - b['bpm']), MAX_BPM_JUMP) / MAX_BPM_JUMP for a, b in adjacent)
+    hit_rate = hits / len(adjacent) if adjacent else 0.0
+    smoothness = 1.0 - jumps / len(adjacent) if adjacent else 1.0
+
+    return (
+        weights.get("fill", 0) * fill
+        + weights.get("transitions", 0) * hit_rate
+        + weights.get("smoothness", 0) * smoothness
+    )
+
+
+# --- Workers ---
+def _init_worker(tracks, transitions):
+    global _TRACKS, _POSITIONS, _TRANSITIONS
+    _TRACKS = tracks
+    _POSITIONS = None if is_table(tracks) else {id(t): p for p, t in enumerate(tracks)}
+    _TRANSITIONS = transitions
+
+
+def _run_candidate(seed, total_duration_seconds, use_auto_segmentation, weights, mix_ratio, engine="dp",
+                   engine_options=None):
+    random.seed(seed)
+    setlist = build_harmonic_graph_setlist(
+        _TRACKS, total_duration_seconds, use_auto_segmentation, _TRANSITIONS, mix_ratio, engine, engine_options
+    )
+    score = setlist_objective(setlist, total_duration_seconds, _TRANSITIONS, weights, mix_ratio)
+    # Spans recorded in a worker go back with the result; empty unless profiling
+    events = instrument.drain() if instrument.enabled() else []
+    if _POSITIONS is None:
+        return seed, score, setlist, events
+    # Positions rather than dicts keep the result pickle small
+    return seed, score, [_POSITIONS[id(t)] for t in setlist], events
+
+
+def generate_best_of(k, scored_tracks, total_duration_seconds, use_auto_segmentation=True,
+                     transitions=None, workers=None, seeds=None, weights=None, mix_ratio=DEFAULT_MIX_RATIO,
+                     engine="dp", engine_options=None):
+    """Run build_harmonic_graph_setlist for k seeds and keep the best Candidate.
+
+    Each candidate reseeds `random` from its own seed, so the winner depends
+    only on the seed list, never on the number of workers. Ties go to the
+    earlier seed. A track list is shipped once per worker, not per task; a
+    TrackTable is placed in shared memory and attached by every worker.
+    `engine` and `engine_options` are passed to the planner; an "anneal"
+    candidate stops on wall time, so only "dp" and "beam" are reproducible.
+    """
+    seeds = list(seeds) if seeds is not None else list(range(k))
+    if not seeds:
+        raise ValueError("generate_best_of needs at least one seed")
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        _init_worker(scored_tracks, transitions)
+        results = [
+            _run_candidate(seed, total_duration_seconds, use_auto_segmentation, weights, mix_ratio,
+                           engine, engine_options)
+            for seed in seeds
+        ]
+    else:
+        with SharedTablePool(min(workers, len(seeds)), scored_tracks, _init_worker, (transitions,)) as pool:
+            futures = [
+                pool.submit(_run_candidate, seed, total_duration_seconds, use_auto_segmentation, weights, mix_ratio,
+                            engine, engine_options)
+                for seed in seeds
+            ]
+            results = [f.result() for f in futures]
+
+    for result in results:
+        instrument.merge(result[3])
+    seed, score, payload, _ = max(results, key=lambda r: (r[1], -seeds.index(r[0])))
+    if is_table(scored_tracks):
+        return Candidate(seed, score, payload)
+    return Candidate(seed, score, [scored_tracks[p] for p in payload])
@@ -0,0 +1,62 @@
+# Planning core for the command line: stdlib only, no NumPy or pandas.
+# Tracks are plain dicts read with sqlite3 and scored row by row; the
+# planner, harmonic index and path engine already work on dicts. pandas,
+# NumPy and Streamlit stay behind the UI, batch and export paths.
+import random
+import sqlite3
+from contextlib import closing
+
+from instrument import span
+# Re-exported so CLI code needs only this module for planning
+from planner import build_harmonic_graph_setlist, estimate_track_duration, get_harmonic_neighbors, parse_key
+from vibes import get_profile
+
+DB_PATH = "dj_tracks.db"
+JITTER = 0.3
+TRACK_COLUMNS = ("track_title", "artist", "bpm", "key", "genre", "time", "duration_s")
+
+
+# --- Loading ---
+def load_tracks(path=DB_PATH, columns=TRACK_COLUMNS):
+    """Rows of the tracks table as dicts, reading only `columns` that exist."""
+    with span("load_library") as stage, closing(sqlite3.connect(path)) as conn:
+        present = {row[1] for row in conn.execute("PRAGMA table_info(tracks)")}
+        selected = [c for c in columns if c in present]
+        cursor = conn.execute(f"SELECT {', '.join(selected)} FROM tracks")
+        tracks = [dict(zip(selected, row)) for row in cursor]
+        stage.count("tracks", len(tracks))
+    return tracks
+
+
+# --- Scoring ---
+def score_track(row, vibe, rng=random):
+    profile = get_profile(vibe)
+    excluded, points = profile.genre_points(row['genre'])
+    if excluded or profile.artist_excluded(row.get('artist')):
+        return 0
+
+    score = points + profile.bpm_points(row['bpm'])
+    # Add slight randomness to break ties in score
+    score += rng.uniform(0, JITTER)
+    return score
+
+
+def score_tracks(tracks, vibe, rng=random):
+    """Set 'vibe_score' on every track dict; the same scores score_library gives.
+
+    A missing genre gets no exclusion and no boost, and only kept tracks
+    draw jitter, in row order, so rng is advanced the same way.
+    """
+    profile = get_profile(vibe)
+    with span("scoring") as stage:
+        stage.count("tracks", len(tracks))
+        for t in tracks:
+            excluded, points = profile.genre_points(t.get('genre'))
+            if excluded or profile.artist_excluded(t.get('artist')):
+                t['vibe_score'] = 0
+                continue
+            bpm = t.get('bpm')
+            points += profile.bpm_points(bpm) if bpm is not None else 0
+            t['vibe_score'] = points + rng.uniform(0, JITTER)
+    return tracks
+
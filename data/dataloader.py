@@ -1,77 +1,511 @@
+import codecs
+import csv
+import hashlib
 import os
 import sqlite3
-import pandas as pd
+import sys
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from camelot import camelot_name
+from durations import parse_time
+from genres import load_config, save_taxonomy, stored_taxonomy
+from query import INDEXES, ensure_version, key_columns
 
 # Correct path to DB in parent folder
 db_path = os.path.join("..", "dj_tracks.db")
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-
-# Create table if it doesn't exist
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS tracks (
-        track_title TEXT,
-        artist TEXT,
-        bpm REAL,
-        key TEXT,
-        genre TEXT,
-        UNIQUE(track_title, artist)
-    )
-''')
-conn.commit()
-
-# Try reading TXT with different encodings
-def read_file_with_encoding_fallback(filepath):
-    encodings = ['utf-8', 'utf-16', 'ISO-8859-1', 'windows-1252']
-    for enc in encodings:
+
+CHUNK_ROWS = 5000
+READ_BYTES = 1 << 20
+# Tried in order for a file without a BOM; ISO-8859-1 decodes any bytes
+FALLBACK_ENCODINGS = ['utf-8', 'windows-1252']
+EXPORT_COLUMNS = ['Track Title', 'Artist', 'BPM', 'Key', 'Genre', 'Time']
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+# Columns added to tracks after the original schema, with their types
+ADDED_COLUMNS = [
+    ("time", "TEXT"), ("row_hash", "TEXT"), ("duration_s", "INTEGER"),
+    # Derived from key and genre (its id in the genres table) for the candidate queries in query.py
+    ("camelot_num", "INTEGER"), ("camelot_mode", "TEXT"), ("genre_id", "INTEGER"),
+]
+
+
+def connect(path=db_path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def ensure_schema(conn):
+    """Create or migrate the schema; returns the columns it had to add."""
+    # Create table if it doesn't exist
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tracks (
+            track_title TEXT,
+            artist TEXT,
+            bpm REAL,
+            key TEXT,
+            genre TEXT,
+            UNIQUE(track_title, artist)
+        )
+    ''')
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(tracks)")}
+    added = set()
+    for name, sql_type in ADDED_COLUMNS:
+        if name not in columns:
+            conn.execute(f"ALTER TABLE tracks ADD COLUMN {name} {sql_type}")
+            added.add(name)
+
+    # Genre taxonomy (genres.py): canonical names under parent families;
+    # tracks.genre_id points here
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS genres (
+            genre_id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            parent_id INTEGER REFERENCES genres (genre_id)
+        )
+    ''')
+    if "parent_id" not in {row[1] for row in conn.execute("PRAGMA table_info(genres)")}:
+        # Rows from before the taxonomy hold raw spellings; normalize_genres re-maps them
+        conn.execute("ALTER TABLE genres ADD COLUMN parent_id INTEGER REFERENCES genres (genre_id)")
+        added.add("parent_id")
+    save_taxonomy(conn, stored_taxonomy(conn))
+    for name, target in INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+    ensure_version(conn)
+
+    ensure_search(conn)
+
+    # One row per imported export, used to skip files that have not changed
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS import_manifest (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            content_hash TEXT,
+            rows INTEGER,
+            imported_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+    return added
+
+
+# Full-text index over titles and artists (see search.py), kept in step
+# with tracks by triggers; built from the existing rows when first created.
+# It holds its own copy of the text with apostrophes dropped, as
+# search.words() does, since unicode61 would split "Don't" into "don" "t".
+SEARCH_COLUMNS = (
+    "replace(replace({0}.track_title, '''', ''), '\u2019', ''), "
+    "replace(replace({0}.artist, '''', ''), '\u2019', '')"
+)
+
+SEARCH_TRIGGERS = {
+    "tracks_search_insert": f'''
+        AFTER INSERT ON tracks BEGIN
+            INSERT INTO track_search (rowid, track_title, artist)
+            VALUES (new.rowid, {SEARCH_COLUMNS.format('new')});
+        END
+    ''',
+    "tracks_search_delete": '''
+        AFTER DELETE ON tracks BEGIN
+            DELETE FROM track_search WHERE rowid = old.rowid;
+        END
+    ''',
+    "tracks_search_update": f'''
+        AFTER UPDATE OF track_title, artist ON tracks BEGIN
+            DELETE FROM track_search WHERE rowid = old.rowid;
+            INSERT INTO track_search (rowid, track_title, artist)
+            VALUES (new.rowid, {SEARCH_COLUMNS.format('new')});
+        END
+    ''',
+}
+
+
+def ensure_search(conn):
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'track_search'").fetchone()
+    if row and "content = 'tracks'" in row[0]:
+        # Older databases indexed tracks' text as is; rebuild with the stripped copy
+        for name in SEARCH_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute("DROP TABLE track_search")
+        row = None
+    if not row:
         try:
-            return pd.read_csv(filepath, sep='\t', encoding=enc)
-        except Exception:
-            continue
-    raise ValueError(f"Failed to read file with any known encoding: {filepath}")
-
-# Infer genre from artist history
-def get_artist_most_common_genre(artist):
-    cursor.execute('''
-        SELECT genre FROM tracks
-        WHERE artist = ? AND genre IS NOT NULL AND genre != ''
-    ''', (artist,))
-    genres = [row[0] for row in cursor.fetchall()]
-    if not genres:
+            conn.execute('''
+                CREATE VIRTUAL TABLE track_search USING fts5 (
+                    track_title, artist,
+                    tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return  # SQLite built without FTS5; the in-memory index still works
+        conn.execute(f"INSERT INTO track_search (rowid, track_title, artist) SELECT rowid, {SEARCH_COLUMNS.format('tracks')} FROM tracks")
+    for name, body in SEARCH_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def file_hash(filepath):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Hash of the exported values, taken before genre imputation so an imputed
+# genre never makes an unchanged export row look different
+def row_hash(row):
+    text = "\x1f".join("" if v is None else str(v) for v in row)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def file_status(conn, filepath):
+    """('unchanged' | 'touched' | 'changed', stat, content hash or None).
+
+    Size and mtime matching the manifest skip the file without reading it;
+    otherwise the content hash decides.
+    """
+    stat = os.stat(filepath)
+    entry = conn.execute(
+        "SELECT size, mtime_ns, content_hash FROM import_manifest WHERE path = ?",
+        (os.path.realpath(filepath),)
+    ).fetchone()
+    if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+        return 'unchanged', stat, entry[2]
+    content_hash = file_hash(filepath)
+    if entry and entry[2] == content_hash:
+        return 'touched', stat, content_hash
+    return 'changed', stat, content_hash
+
+
+def record_import(conn, filepath, stat, content_hash, rows=None):
+    with conn:
+        conn.execute('''
+            INSERT INTO import_manifest (path, size, mtime_ns, content_hash, rows)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                content_hash = excluded.content_hash,
+                rows = COALESCE(excluded.rows, import_manifest.rows),
+                imported_at = CURRENT_TIMESTAMP
+        ''', (os.path.realpath(filepath), stat.st_size, stat.st_mtime_ns, content_hash, rows))
+
+
+def _decodes(filepath, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(filepath, 'rb') as f:
+        try:
+            for block in iter(lambda: f.read(READ_BYTES), b''):
+                decoder.decode(block)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return False
+    return True
+
+
+# Pick the encoding once, before any row is written: from the BOM, else the
+# first fallback the whole file decodes in, so a stray cp1252 byte deep in
+# the file cannot fail the import halfway
+def detect_encoding(filepath):
+    with open(filepath, 'rb') as f:
+        head = f.read(4)
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    for encoding in FALLBACK_ENCODINGS:
+        if _decodes(filepath, encoding):
+            return encoding
+    return 'ISO-8859-1'
+
+
+# Empty fields become NULL, as pandas' NaN did; values are otherwise kept as-is
+def _text(value):
+    return value if value else None
+
+
+def _key(value):
+    # Musical keys ("Am", "F#m") are stored as Camelot ("8A", "11A"); unreadable keys are kept as-is
+    if not value:
         return None
-    return pd.Series(genres).mode()[0]
-
-# Load all .txt files in current folder
-def load_txt_files(folder="."):
-    for filename in os.listdir(folder):
-        if filename.endswith(".txt"):
-            filepath = os.path.join(folder, filename)
-            try:
-                df = read_file_with_encoding_fallback(filepath)
-                subset = df[['Track Title', 'Artist', 'BPM', 'Key', 'Genre']]
-                for _, row in subset.iterrows():
-                    genre = row['Genre']
-                    if pd.isna(genre) or str(genre).strip() == "":
-                        inferred_genre = get_artist_most_common_genre(row['Artist'])
-                        genre = inferred_genre if inferred_genre else None
-
-                    try:
-                        cursor.execute('''
-                            INSERT OR REPLACE INTO tracks (track_title, artist, bpm, key, genre)
-                            VALUES (?, ?, ?, ?, ?)
-                        ''', (
-                            row['Track Title'], 
-                            row['Artist'], 
-                            row['BPM'], 
-                            row['Key'], 
-                            genre
-                        ))
-                    except Exception as e:
-                        print(f"Insert error in {filename}, row {row}: {e}")
-            except Exception as e:
-                print(f"Failed to read {filename}: {e}")
-    conn.commit()
+    return camelot_name(value) or value
+
+
+def _has_genre(row):
+    return bool(row[4] and row[4].strip())
+
+
+def _bpm(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Stream an export as lists of (title, artist, bpm, key, genre, time) rows
+def read_export_chunks(filepath, chunk_rows=CHUNK_ROWS):
+    encoding = detect_encoding(filepath)
+    with open(filepath, encoding=encoding, newline='') as f:
+        reader = csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [h.strip() for h in header]
+        missing = [c for c in EXPORT_COLUMNS if c not in header and c != 'Time']
+        if missing:
+            raise ValueError(f"{filepath} is missing columns: {', '.join(missing)}")
+        title_i, artist_i, bpm_i, key_i, genre_i = (header.index(c) for c in EXPORT_COLUMNS[:5])
+        time_i = header.index('Time') if 'Time' in header else None
+        width = len(header)
+
+        chunk = []
+        for row in reader:
+            if not row:
+                continue
+            row += [''] * (width - len(row))
+            chunk.append((
+                _text(row[title_i]),
+                _text(row[artist_i]),
+                _bpm(row[bpm_i]),
+                _key(row[key_i]),
+                _text(row[genre_i]),
+                _text(row[time_i]) if time_i is not None else None,
+            ))
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+# Infer genre from artist history: one grouped query for every artist in the batch
+def artist_mode_genres(conn, artists):
+    if not artists:
+        return {}
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_artists (artist TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM batch_artists")
+    conn.executemany("INSERT OR IGNORE INTO batch_artists VALUES (?)", ((a,) for a in artists))
+    counts = defaultdict(Counter)
+    for artist, genre, count in conn.execute('''
+        SELECT t.artist, t.genre, COUNT(*)
+        FROM tracks t JOIN batch_artists b ON t.artist = b.artist
+        WHERE t.genre IS NOT NULL AND t.genre != ''
+        GROUP BY t.artist, t.genre
+    '''):
+        counts[artist][genre] = count
+    # Same tie-break as pandas mode(): the smallest of the most common values
+    return {
+        artist: min(g for g, c in genres.items() if c == max(genres.values()))
+        for artist, genres in counts.items()
+    }
+
+
+def stored_hashes(conn, chunk):
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_keys (track_title TEXT, artist TEXT)")
+    conn.execute("DELETE FROM batch_keys")
+    conn.executemany("INSERT INTO batch_keys VALUES (?, ?)", ((row[0], row[1]) for row in chunk))
+    return {
+        (title, artist): stored
+        for title, artist, stored in conn.execute('''
+            SELECT t.track_title, t.artist, t.row_hash
+            FROM tracks t JOIN batch_keys b
+              ON t.track_title = b.track_title AND t.artist = b.artist
+        ''')
+    }
+
+
+# Taxonomy id of each raw genre, adding genres the genres table lacks
+def genre_ids(conn, genres):
+    taxonomy = stored_taxonomy(conn)
+    known = len(taxonomy)
+    ids = {g: taxonomy.id_for(g) for g in genres}
+    if len(taxonomy) > known:
+        save_taxonomy(conn, taxonomy)
+    return ids
+
+
+# Append the stored camelot_num, camelot_mode and genre_id to upsert rows
+def with_query_columns(conn, rows):
+    ids = genre_ids(conn, {row[4] for row in rows})
+    return [row + key_columns(row[3]) + (ids[row[4]],) for row in rows]
+
+
+def write_chunk(conn, chunk):
+    """Upsert the rows of `chunk` whose exported values changed; returns how many."""
+    upsert = '''
+        INSERT INTO tracks (track_title, artist, bpm, key, genre, time, duration_s, row_hash,
+                            camelot_num, camelot_mode, genre_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(track_title, artist) DO UPDATE SET
+            bpm = excluded.bpm,
+            key = excluded.key,
+            genre = excluded.genre,
+            time = excluded.time,
+            duration_s = excluded.duration_s,
+            row_hash = excluded.row_hash,
+            camelot_num = excluded.camelot_num,
+            camelot_mode = excluded.camelot_mode,
+            genre_id = excluded.genre_id
+        WHERE tracks.row_hash IS NOT excluded.row_hash
+    '''
+    with conn:
+        existing = stored_hashes(conn, chunk)
+        changed = []
+        for row in chunk:
+            h = row_hash(row)
+            if existing.get((row[0], row[1])) != h:
+                changed.append(row + (parse_time(row[5]), h))
+        if not changed:
+            return 0
+
+        # Rows with a genre go first so they count toward the imputation below
+        conn.executemany(upsert, with_query_columns(conn, [row for row in changed if _has_genre(row)]))
+        missing = [row for row in changed if not _has_genre(row)]
+        if missing:
+            modes = artist_mode_genres(conn, {row[1] for row in missing if row[1]})
+            conn.executemany(upsert, with_query_columns(conn, [
+                (title, artist, bpm, key, modes.get(artist), track_time, seconds, h)
+                for title, artist, bpm, key, _, track_time, seconds, h in missing
+            ]))
+    return len(changed)
+
+
+# Load all .txt files in current folder, skipping exports that have not changed
+def load_txt_files(folder=".", conn=None, force=False):
+    conn = conn or connect()
+    ensure_schema(conn)
+    total_rows = 0
+    total_start = time.perf_counter()
+    for filename in sorted(os.listdir(folder)):
+        if not filename.endswith(".txt"):
+            continue
+        filepath = os.path.join(folder, filename)
+        start = time.perf_counter()
+        try:
+            status, stat, content_hash = file_status(conn, filepath)
+            if status == 'touched':
+                record_import(conn, filepath, stat, content_hash)
+            if status != 'changed' and not force:
+                print(f"{filename}: unchanged, skipped")
+                continue
+
+            rows = written = 0
+            for chunk in read_export_chunks(filepath):
+                written += write_chunk(conn, chunk)
+                rows += len(chunk)
+            record_import(conn, filepath, stat, content_hash, rows)
+        except (OSError, UnicodeDecodeError, ValueError, sqlite3.Error) as e:
+            print(f"Failed to load {filename}: {e}")
+            continue
+        elapsed = time.perf_counter() - start
+        total_rows += rows
+        print(f"{filename}: {rows} rows ({written} changed) in {elapsed:.2f}s "
+              f"({rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+    elapsed = time.perf_counter() - total_start
+    print(f"Imported {total_rows} rows in {elapsed:.2f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+    return total_rows
+
+
+# Migration: fill duration_s for rows imported before it existed, first from
+# the stored time text, then from the exports for rows that predate that too
+def backfill_durations(conn, folder="."):
+    with conn:
+        rows = conn.execute(
+            "SELECT rowid, time FROM tracks WHERE duration_s IS NULL AND time IS NOT NULL"
+        ).fetchall()
+        conn.executemany(
+            "UPDATE tracks SET duration_s = ? WHERE rowid = ?",
+            [(parse_time(t), rowid) for rowid, t in rows if parse_time(t) is not None]
+        )
+
+    remaining = conn.execute("SELECT COUNT(*) FROM tracks WHERE duration_s IS NULL").fetchone()[0]
+    filled = 0
+    for filename in sorted(os.listdir(folder)):
+        if not remaining or not filename.endswith(".txt"):
+            continue
+        try:
+            for chunk in read_export_chunks(os.path.join(folder, filename)):
+                updates = [
+                    (parse_time(t), t, title, artist)
+                    for title, artist, _, _, _, t in chunk if parse_time(t) is not None
+                ]
+                with conn:
+                    before = conn.total_changes
+                    conn.executemany('''
+                        UPDATE tracks SET duration_s = ?, time = ?
+                        WHERE track_title = ? AND artist = ? AND duration_s IS NULL
+                    ''', updates)
+                    filled += conn.total_changes - before
+        except (OSError, UnicodeDecodeError, ValueError, sqlite3.Error) as e:
+            print(f"Failed to read {filename}: {e}")
+        remaining = conn.execute("SELECT COUNT(*) FROM tracks WHERE duration_s IS NULL").fetchone()[0]
+
+    print(f"Backfilled durations: {len(rows) + filled} rows, {remaining} still unknown")
+
+
+# Migration: fill camelot_num, camelot_mode and genre_id for rows imported
+# before they existed
+def backfill_query_columns(conn):
+    with conn:
+        rows = conn.execute('''
+            SELECT rowid, key, genre FROM tracks
+            WHERE (key IS NOT NULL AND camelot_num IS NULL) OR (genre IS NOT NULL AND genre_id IS NULL)
+        ''').fetchall()
+        ids = genre_ids(conn, {genre for _, _, genre in rows})
+        conn.executemany(
+            "UPDATE tracks SET camelot_num = ?, camelot_mode = ?, genre_id = ? WHERE rowid = ?",
+            [key_columns(key) + (ids[genre], rowid) for rowid, key, genre in rows]
+        )
+        conn.execute("ANALYZE tracks")
+    print(f"Indexed keys and genres: {len(rows)} rows")
+
+
+# Migration: re-map every track's genre through genres.json, for genre ids
+# from before the taxonomy or after editing its families and aliases
+def normalize_genres(conn):
+    with conn:
+        taxonomy = stored_taxonomy(conn)
+        raw = [g for (g,) in conn.execute("SELECT DISTINCT genre FROM tracks WHERE genre IS NOT NULL")]
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS genre_map (genre TEXT PRIMARY KEY, genre_id INTEGER)")
+        conn.execute("DELETE FROM genre_map")
+        conn.executemany("INSERT INTO genre_map VALUES (?, ?)", [(g, taxonomy.id_for(g)) for g in raw])
+        conn.execute('''
+            UPDATE tracks SET genre_id = (SELECT m.genre_id FROM genre_map m WHERE m.genre = tracks.genre)
+            WHERE genre IS NOT NULL
+        ''')
+        save_taxonomy(conn, taxonomy)
+
+        # Names no track and no configured family uses any more, such as raw spellings
+        used = {genre_id for (genre_id,) in conn.execute("SELECT DISTINCT genre_id FROM tracks WHERE genre_id IS NOT NULL")}
+        configured = load_config().parents
+        stale = [
+            (genre_id,) for genre_id, name in taxonomy.names.items()
+            if genre_id not in used and name not in configured and genre_id not in taxonomy.parents.values()
+        ]
+        conn.executemany("DELETE FROM genres WHERE genre_id = ?", stale)
+    print(f"Normalized genres: {len(raw)} spellings to {len(used)} genres")
+
 
 # Run the loader
-load_txt_files(".")
-conn.close()
+if __name__ == "__main__":
+    conn = connect()
+    added = ensure_schema(conn)
+    load_txt_files(".", conn, force="--full" in sys.argv)
+    if "duration_s" in added or "--backfill-durations" in sys.argv:
+        backfill_durations(conn, ".")
+    if "parent_id" in added or "--reindex" in sys.argv:
+        normalize_genres(conn)
+    if "camelot_num" in added or "--reindex" in sys.argv:
+        backfill_query_columns(conn)
+    conn.close()
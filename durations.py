@@ -0,0 +1,23 @@
+# Track lengths in whole seconds, from the loader's duration_s column or
+# an export's "Time" text ("3:45", "1:02:10").
+
+
+def parse_time(value):
+    """Seconds in an "mm:ss" or "h:mm:ss" export time, None if unparseable."""
+    if not isinstance(value, str) or ':' not in value:
+        return None
+    try:
+        seconds = 0
+        for part in value.strip().split(':'):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    except ValueError:
+        return None
+
+
+def track_length(track):
+    """Full length of a track dict or row from duration_s or its time, None if unknown."""
+    seconds = track.get("duration_s")
+    if seconds and seconds == seconds:  # skips None, 0 and NaN
+        return int(seconds)
+    return parse_time(track.get("time"))
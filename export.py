@@ -0,0 +1,190 @@
+# Setlist export: CSV, M3U8 and rekordbox playlist XML, written track by
+# track with the stdlib csv writer and SAX XMLGenerator into one reusable
+# in-memory buffer (or straight to a file).
+import csv
+import io
+import threading
+from collections import namedtuple
+from datetime import timedelta
+from xml.sax.saxutils import XMLGenerator
+
+from camelot import musical_name, normalize_key
+from durations import track_length
+from planner import estimate_track_duration
+from vibes import DEFAULT_MIX_RATIO
+
+CSV_FIELDS = ["playlist", "position", "starts_at", "track_title", "artist", "bpm", "key", "genre"]
+PRODUCT = {"Name": "Smart DJ Setlist Generator", "Version": "1.0", "Company": ""}
+
+# Each format's file extension and media type
+FORMATS = {
+    "csv": ("csv", "text/csv; charset=utf-8"),
+    "m3u8": ("m3u8", "audio/x-mpegurl; charset=utf-8"),
+    "rekordbox": ("xml", "application/xml; charset=utf-8"),
+}
+
+Playlist = namedtuple("Playlist", ["name", "tracks", "start_time", "mix_ratio"], defaults=(None, DEFAULT_MIX_RATIO))
+Entry = namedtuple("Entry", ["position", "starts_at", "play_seconds", "track"])
+
+
+# --- Timeline ---
+def timeline(playlist):
+    """An Entry per track: its 1-based position, planned start and seconds played.
+
+    starts_at is a datetime when the playlist has a start time, else the
+    track's own "starts_at" text (as /generate returns it) or None.
+    """
+    current = playlist.start_time
+    for position, track in enumerate(playlist.tracks, 1):
+        play_seconds = estimate_track_duration(track, playlist.mix_ratio)
+        starts_at = current if current is not None else track.get("starts_at")
+        yield Entry(position, starts_at, play_seconds, track)
+        if current is not None:
+            current += timedelta(seconds=play_seconds)
+
+
+def clock(starts_at):
+    return starts_at.strftime("%H:%M") if hasattr(starts_at, "strftime") else starts_at
+
+
+def _text(value):
+    if value is None or value != value:  # None or NaN
+        return ""
+    return str(value)
+
+
+# --- Writers ---
+def write_csv(out, playlists, fields=CSV_FIELDS):
+    """One row per track of every playlist: the playlist's name, the track's position and HH:MM start."""
+    writer = csv.DictWriter(out, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    for playlist in playlists:
+        writer.writerows(
+            dict(entry.track, playlist=playlist.name, position=entry.position, starts_at=clock(entry.starts_at))
+            for entry in timeline(playlist)
+        )
+
+
+def write_m3u8(out, playlists):
+    """Extended M3U in UTF-8: #EXTINF with each track's length (-1 if unknown).
+
+    The loader keeps no file locations, so a track's "location" is used
+    when present and "Artist - Title" otherwise; players that need files
+    match on that name.
+    """
+    out.write("#EXTM3U\n")
+    for playlist in playlists:
+        if playlist.name:
+            out.write(f"#PLAYLIST:{playlist.name}\n")
+        for entry in timeline(playlist):
+            track = entry.track
+            label = f"{_text(track.get('artist'))} - {_text(track.get('track_title'))}"
+            length = track_length(track)
+            out.write(f"#EXTINF:{-1 if length is None else length},{label}\n")
+            out.write(f"{track.get('location') or label}\n")
+
+
+def write_rekordbox(out, playlists):
+    """rekordbox DJ_PLAYLISTS XML: a COLLECTION of the tracks and one playlist NODE per set.
+
+    A track used more than once appears once in the collection. Each use
+    adds two memory cues named by the set clock: "In HH:MM" at the track's
+    start and "Out HH:MM" where the plan mixes out of it, prefixed with the
+    set's name when several sets are exported together.
+    """
+    playlists = list(playlists)
+    ids, tracks, marks, keys = {}, {}, {}, []
+    for playlist in playlists:
+        prefix = f"{playlist.name} " if len(playlists) > 1 and playlist.name else ""
+        set_keys = []
+        for entry in timeline(playlist):
+            track = entry.track
+            identity = (_text(track.get("artist")).lower(), _text(track.get("track_title")).lower())
+            track_id = ids.get(identity)
+            if track_id is None:
+                track_id = ids[identity] = len(ids) + 1
+                tracks[track_id], marks[track_id] = track, []
+            start, end = clock(entry.starts_at), None
+            if hasattr(entry.starts_at, "strftime"):
+                end = clock(entry.starts_at + timedelta(seconds=entry.play_seconds))
+            marks[track_id].append((f"{prefix}In {start}" if start else f"{prefix}In", 0))
+            marks[track_id].append((f"{prefix}Out {end}" if end else f"{prefix}Out", entry.play_seconds))
+            set_keys.append(track_id)
+        keys.append(set_keys)
+
+    xml = XMLGenerator(out, "UTF-8", short_empty_elements=True)
+    xml.startDocument()
+    xml.startElement("DJ_PLAYLISTS", {"Version": "1.0.0"})
+    xml.startElement("PRODUCT", PRODUCT)
+    xml.endElement("PRODUCT")
+
+    xml.startElement("COLLECTION", {"Entries": str(len(tracks))})
+    for track_id, track in tracks.items():
+        xml.startElement("TRACK", _track_attributes(track_id, track))
+        for name, seconds in marks[track_id]:
+            xml.startElement("POSITION_MARK", {"Name": name, "Type": "0", "Start": f"{seconds:.3f}", "Num": "-1"})
+            xml.endElement("POSITION_MARK")
+        xml.endElement("TRACK")
+    xml.endElement("COLLECTION")
+
+    xml.startElement("PLAYLISTS", {})
+    xml.startElement("NODE", {"Type": "0", "Name": "ROOT", "Count": str(len(playlists))})
+    for playlist, set_keys in zip(playlists, keys):
+        xml.startElement("NODE", {"Name": playlist.name or "Setlist", "Type": "1", "KeyType": "0", "Entries": str(len(set_keys))})
+        for track_id in set_keys:
+            xml.startElement("TRACK", {"Key": str(track_id)})
+            xml.endElement("TRACK")
+        xml.endElement("NODE")
+    xml.endElement("NODE")
+    xml.endElement("PLAYLISTS")
+    xml.endElement("DJ_PLAYLISTS")
+    xml.endDocument()
+
+
+def _track_attributes(track_id, track):
+    attributes = {
+        "TrackID": str(track_id),
+        "Name": _text(track.get("track_title")),
+        "Artist": _text(track.get("artist")),
+        "Genre": _text(track.get("genre")),
+        "Tonality": musical_name(normalize_key(track.get("key") or "")),
+    }
+    bpm = track.get("bpm")
+    if bpm is not None and bpm == bpm:
+        attributes["AverageBpm"] = f"{float(bpm):.2f}"
+    length = track_length(track)
+    if length is not None:
+        attributes["TotalTime"] = str(length)
+    if track.get("location"):
+        attributes["Location"] = str(track["location"])
+    return attributes
+
+
+WRITERS = {"csv": write_csv, "m3u8": write_m3u8, "rekordbox": write_rekordbox}
+
+
+# --- Output ---
+_local = threading.local()
+
+
+def render(playlists, fmt="csv"):
+    """The export as UTF-8 bytes, serialized once into this thread's reusable buffer."""
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = io.StringIO()
+    buffer.seek(0)
+    buffer.truncate()
+    WRITERS[fmt](buffer, playlists)
+    return buffer.getvalue().encode("utf-8")
+
+
+def write_file(path, playlists, fmt="csv"):
+    """Write the export straight to `path`, one track at a time."""
+    with open(path, "w", newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+        WRITERS[fmt](f, playlists)
+
+
+def format_for(path):
+    """Export format for a file name's extension, None if it has no writer."""
+    extension = path.rsplit(".", 1)[-1].lower()
+    return next((fmt for fmt, (ext, _) in FORMATS.items() if ext == extension), None)
@@ -0,0 +1,177 @@
+# Genre taxonomy: free-text export genres ("Rap/HipHop", "hip-hop & rap",
+# "R & B") are cleaned, mapped through the alias table in genres.json and
+# interned as small integer ids, each under a parent family. Vibe rules
+# are compiled to bitmasks over those ids.
+import json
+import os
+import re
+import threading
+from functools import lru_cache
+
+GENRES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "genres.json")
+
+
+def clean_genre(genre):
+    """Lowercased genre with runs of whitespace collapsed, or None for a missing genre."""
+    if genre is None or genre != genre:  # None or NaN
+        return None
+    return " ".join(str(genre).lower().split()) or None
+
+
+# --- Configuration ---
+class GenreConfig:
+    """genres.json: families with their sub-genres, and aliases to those names.
+
+    `pattern` finds configured names inside an unknown genre, longest
+    first, so "deep sea house" can be filed under house.
+    """
+
+    def __init__(self, families, aliases):
+        self.parents = {}  # configured name -> family name, or None for a family
+        for family, children in families.items():
+            family = clean_genre(family)
+            self.parents[family] = None
+            for child in children:
+                self.parents[clean_genre(child)] = family
+        self.aliases = {clean_genre(raw): clean_genre(name) for raw, name in aliases.items()}
+        names = sorted(self.parents, key=len, reverse=True)
+        self.pattern = re.compile(r"(?<!\w)(?:%s)(?!\w)" % "|".join(re.escape(n) for n in names)) if names else None
+
+
+@lru_cache(maxsize=None)
+def load_config(path=GENRES_PATH):
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return GenreConfig(raw.get("families", {}), raw.get("aliases", {}))
+
+
+# --- Taxonomy ---
+class Taxonomy:
+    """Genre names <-> small integer ids, each with an optional parent.
+
+    names:   id -> canonical name
+    parents: id -> parent id, or None for a family
+    lineage: id -> bitmask of the id and all its ancestors, so a rule
+             naming a family matches its sub-genres with one AND
+    Genres met for the first time are added under the longest configured
+    name they contain, so ids only grow and a compiled mask stays valid.
+    Their lineage covers every configured name they contain, so "pop
+    rock" is filed under rock yet still matches rules on pop.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.names = {}
+        self.parents = {}
+        self.lineage = {}
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows=(), config=None):
+        """Taxonomy over stored (genre_id, name, parent_id) rows, with `config` applied on top."""
+        taxonomy = cls(config or load_config())
+        for genre_id, name, _ in rows:
+            taxonomy.names[genre_id] = name
+            taxonomy._ids[name] = genre_id
+        # Configured families come before their sub-genres
+        for name, parent in taxonomy.config.parents.items():
+            genre_id = taxonomy._ids.get(name)
+            if genre_id is None:
+                genre_id = taxonomy._ids[name] = taxonomy._next_id()
+                taxonomy.names[genre_id] = name
+            taxonomy.parents[genre_id] = None if parent is None else taxonomy._ids[parent]
+        for genre_id in taxonomy.parents:
+            taxonomy._link(genre_id, ())
+        # Other stored genres are filed again, so edits to genres.json reach them
+        for genre_id, name in taxonomy.names.items():
+            if genre_id not in taxonomy.parents:
+                taxonomy.parents[genre_id], named = taxonomy._file_under(name)
+                taxonomy.lineage[genre_id] = (1 << genre_id) | named
+        return taxonomy
+
+    def _next_id(self):
+        return max(self.names, default=0) + 1
+
+    def _link(self, genre_id, seen):
+        mask = self.lineage.get(genre_id)
+        if mask is None:
+            parent = self.parents.get(genre_id)
+            # A parent chain edited by hand into a loop stops where it repeats
+            inherited = self._link(parent, seen + (genre_id,)) if parent is not None and parent not in seen else 0
+            mask = self.lineage[genre_id] = (1 << genre_id) | inherited
+        return mask
+
+    def __len__(self):
+        return len(self.names)
+
+    def canonical(self, genre):
+        name = clean_genre(genre)
+        return self.config.aliases.get(name, name) if name else None
+
+    def id_for(self, genre):
+        """Id of a raw genre's canonical name, adding it if new; None for a missing genre."""
+        name = self.canonical(genre)
+        if name is None:
+            return None
+        genre_id = self._ids.get(name)
+        if genre_id is None:
+            with self._lock:
+                genre_id = self._ids.get(name)
+                if genre_id is None:
+                    genre_id = self._add(name)
+        return genre_id
+
+    def _file_under(self, name):
+        # (the longest configured genre named in `name` or None, the lineage
+        # of every configured genre it names)
+        found = self.config.pattern.findall(name) if self.config.pattern is not None else None
+        if not found:
+            return None, 0
+        named = 0
+        for match in set(found):
+            named |= self.lineage[self._ids[match]]
+        return self._ids[max(found, key=len)], named
+
+    def _add(self, name):
+        parent, named = self._file_under(name)
+        genre_id = self._next_id()
+        self.names[genre_id] = name
+        self.parents[genre_id] = parent
+        self.lineage[genre_id] = (1 << genre_id) | named
+        # Published last: a reader that finds the name finds it complete
+        self._ids[name] = genre_id
+        return genre_id
+
+    def family(self, genre_id):
+        while self.parents.get(genre_id) is not None:
+            genre_id = self.parents[genre_id]
+        return genre_id
+
+    def mask(self, genres):
+        """Bitmask with the id of each of `genres`; with lineage it also covers their sub-genres."""
+        mask = 0
+        for genre in genres:
+            genre_id = self.id_for(genre)
+            if genre_id is not None:
+                mask |= 1 << genre_id
+        return mask
+
+
+@lru_cache(maxsize=None)
+def default_taxonomy(path=GENRES_PATH):
+    """genres.json alone, for tracks that carry only genre text (dicts, DataFrames)."""
+    return Taxonomy.from_rows((), load_config(path))
+
+
+# --- Stored Taxonomy ---
+def stored_taxonomy(conn, path=GENRES_PATH):
+    """The loader's genres table as a Taxonomy, with genres.json applied over it."""
+    return Taxonomy.from_rows(conn.execute("SELECT genre_id, name, parent_id FROM genres"), load_config(path))
+
+
+def save_taxonomy(conn, taxonomy):
+    conn.executemany('''
+        INSERT INTO genres (genre_id, name, parent_id) VALUES (?, ?, ?)
+        ON CONFLICT(genre_id) DO UPDATE SET name = excluded.name, parent_id = excluded.parent_id
+    ''', [(genre_id, name, taxonomy.parents[genre_id]) for genre_id, name in sorted(taxonomy.names.items())])
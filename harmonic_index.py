@@ -0,0 +1,88 @@
+from bisect import bisect_left, bisect_right
+
+from camelot import KEYS, NEIGHBORS, NO_KEY, normalize_key
+
+BPM_WINDOW = 25
+
+
+# --- Harmonic Index ---
+class HarmonicIndex:
+    """Tracks bucketed by Camelot key code (0..23), each bucket sorted by BPM.
+
+    Built once per library; edge lookups read the buckets of the key's
+    camelot.NEIGHBORS plus a bisect window instead of a scan over every
+    other track.
+    """
+
+    def __init__(self, tracks, bpm_window=BPM_WINDOW):
+        key_codes = [normalize_key(t.get('key', '')) for t in tracks]
+        bpms = [float(t['bpm']) for t in tracks]
+        self._build(key_codes, bpms, bpm_window)
+
+    @classmethod
+    def from_arrays(cls, key_codes, bpms, bpm_window=BPM_WINDOW):
+        """Index from parallel key codes (NO_KEY if unknown) and BPM values."""
+        index = cls.__new__(cls)
+        index._build([int(code) for code in key_codes], [float(b) for b in bpms], bpm_window)
+        return index
+
+    def _build(self, key_codes, bpms, bpm_window):
+        self.bpm_window = bpm_window
+        self.key_codes = key_codes  # for camelot's tables
+        self.bpms = bpms
+
+        buckets = [[] for _ in range(KEYS)]
+        for i, (code, bpm) in enumerate(zip(key_codes, bpms)):
+            if code != NO_KEY:
+                buckets[code].append((bpm, i))
+
+        self._bucket_bpms = []
+        self._bucket_ids = []
+        for entries in buckets:
+            entries.sort()
+            self._bucket_bpms.append([bpm for bpm, _ in entries])
+            self._bucket_ids.append([i for _, i in entries])
+
+    def __len__(self):
+        return len(self.key_codes)
+
+    def camelot_nums(self):
+        """Camelot number (1..12) of each track, 0 if its key is unknown."""
+        return [code // 2 + 1 if code != NO_KEY else 0 for code in self.key_codes]
+
+    def bucket(self, code):
+        return self._bucket_ids[code] if code != NO_KEY else []
+
+    def lookup(self, key, bpm, bpm_window=None):
+        """Indices of every track harmonically compatible with (key, bpm).
+
+        `bpm_window` narrows (or widens) the BPM range for this lookup only.
+        """
+        code = normalize_key(key)
+        if code == NO_KEY:
+            return []
+        return self._window(code, float(bpm), bpm_window)
+
+    def neighbors(self, i):
+        code = self.key_codes[i]
+        if code == NO_KEY:
+            return []
+        return [j for j in self._window(code, self.bpms[i]) if j != i]
+
+    def _window(self, code, bpm, bpm_window=None):
+        window = self.bpm_window if bpm_window is None else bpm_window
+        result = []
+        for nc in NEIGHBORS[code]:
+            bpms = self._bucket_bpms[nc]
+            if not bpms:
+                continue
+            lo = bisect_left(bpms, bpm - window)
+            hi = bisect_right(bpms, bpm + window)
+            ids = self._bucket_ids[nc]
+            # Re-check the ends so float rounding matches abs(bpm1 - bpm2) <= window
+            while lo < hi and abs(bpms[lo] - bpm) > window:
+                lo += 1
+            while hi > lo and abs(bpms[hi - 1] - bpm) > window:
+                hi -= 1
+            result.extend(ids[lo:hi])
+        return result
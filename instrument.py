@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+
+PROFILE_ENV = "SETLIST_PROFILE"  # any non-empty value turns spans on
+TRACE_ENV = "SETLIST_TRACE"      # path to write a Chrome trace to at exit of main.py
+
+_enabled = bool(os.environ.get(PROFILE_ENV))
+_events = []
+_events_lock = threading.Lock()
+_local = threading.local()
+
+
+# --- Spans ---
+class _NullSpan:
+    """Shared stand-in while profiling is off; entering and counting do nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __bool__(self):
+        return False
+
+    def count(self, name, n=1):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "start", "counters")
+
+    def __init__(self, name):
+        self.name = name
+        self.counters = {}
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        stack = _local.stack
+        # A generator can leave its span open across a yield, so spans may
+        # close out of order; remove this one wherever it is
+        if stack and stack[-1] is self:
+            stack.pop()
+        elif self in stack:
+            stack.remove(self)
+        event = {
+            "name": self.name,
+            "start": self.start,
+            "seconds": seconds,
+            "depth": len(stack),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "counters": self.counters,
+        }
+        with _events_lock:
+            _events.append(event)
+        return False
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+
+def span(name):
+    """Context manager timing one pipeline stage; a no-op unless profiling is on."""
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name)
+
+
+def count(name, n=1):
+    """Add `n` to a counter on the innermost open span of this thread."""
+    if not _enabled:
+        return
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].count(name, n)
+
+
+# --- Switches ---
+def enable():
+    """Turn spans on here and in worker processes started from now on."""
+    global _enabled
+    _enabled = True
+    os.environ[PROFILE_ENV] = "1"
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    os.environ.pop(PROFILE_ENV, None)
+
+
+def enabled():
+    return _enabled
+
+
+# --- Collected Events ---
+def drain():
+    """Every finished span since the last drain, oldest first; clears them."""
+    global _events
+    with _events_lock:
+        events, _events = _events, []
+    return events
+
+
+def merge(events):
+    """Add spans recorded elsewhere, e.g. returned by a worker process."""
+    with _events_lock:
+        _events.extend(events)
+
+
+def summary(events=None):
+    """Per-stage totals: [{name, calls, seconds, counters}], in first-seen order."""
+    if events is None:
+        with _events_lock:
+            events = list(_events)
+    stages = {}
+    for event in sorted(events, key=lambda e: e["start"]):
+        stage = stages.get(event["name"])
+        if stage is None:
+            stage = stages[event["name"]] = {"name": event["name"], "calls": 0, "seconds": 0.0, "counters": {}}
+        stage["calls"] += 1
+        stage["seconds"] += event["seconds"]
+        for name, n in event["counters"].items():
+            stage["counters"][name] = stage["counters"].get(name, 0) + n
+    return list(stages.values())
+
+
+def format_summary(stages):
+    lines = [f"{'stage':<16} {'calls':>6} {'total ms':>10}  counters", "-" * 60]
+    for stage in stages:
+        counters = ", ".join(f"{k}={v:,}" for k, v in stage["counters"].items())
+        lines.append(f"{stage['name']:<16} {stage['calls']:>6} {stage['seconds'] * 1000:>10.1f}  {counters}")
+    return "\n".join(lines)
+
+
+def write_trace(path, events=None):
+    """Write spans as a Chrome trace (chrome://tracing, Perfetto) plus the summary."""
+    if events is None:
+        with _events_lock:
+            events = list(_events)
+    origin = min((e["start"] for e in events), default=0.0)
+    trace = {
+        "traceEvents": [
+            {
+                "name": e["name"],
+                "ph": "X",
+                "ts": (e["start"] - origin) * 1e6,
+                "dur": e["seconds"] * 1e6,
+                "pid": e["pid"],
+                "tid": e["tid"],
+                "args": e["counters"],
+            }
+            for e in events
+        ],
+        "displayTimeUnit": "ms",
+        "summary": summary(events),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f)
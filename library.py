@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+from core import DB_PATH
+from harmonic_index import HarmonicIndex
+from instrument import span
+from query import candidate_rowids, library_version
+from search import RESULT_CAP, SearchIndex
+from track_table import TrackTable
+
+MAX_CACHED = 4
+
+
+# --- Library Snapshot ---
+class Library:
+    """Everything derived from one version of the tracks table.
+
+    df:         the tracks table as read from SQLite, indexed by rowid
+    table:      TrackTable over the same rows, in the same order
+    index:      HarmonicIndex over the whole library
+    search:     SearchIndex over titles and artists, built on first use
+    """
+
+    def __init__(self, df, load_seconds, path=DB_PATH):
+        self.df = df
+        self.path = path
+        self.load_seconds = load_seconds
+        self.table = TrackTable.from_frame(df)
+        self.index = HarmonicIndex.from_arrays(self.table.key_code.tolist(), self.table.bpm.tolist())
+        self._search = None
+
+    @property
+    def search(self):
+        # Only the track picker needs it, so generation never pays for the build
+        if self._search is None:
+            with span("search_index") as stage:
+                self._search = SearchIndex(self.df['track_title'].tolist(), self.df['artist'].tolist())
+                stage.count("words", len(self._search.vocabulary))
+        return self._search
+
+    def find(self, query, limit=RESULT_CAP):
+        """Row positions of the tracks best matching `query`, best first."""
+        return self.search.search(query, limit) if query else []
+
+    def candidate_positions(self, vibe):
+        """Row positions of the tracks `vibe` can use, selected in SQLite by query.py.
+
+        Every row for a database the loader has not indexed yet.
+        """
+        rowids = candidate_rowids(vibe, self.path)
+        if rowids is None:
+            return range(len(self.df))
+        positions = self.df.index.get_indexer(rowids)
+        # Rows written since this snapshot was read are not in it
+        return positions[positions >= 0]
+
+
+# --- Process-level Cache ---
+_cache = OrderedDict()
+_lock = threading.Lock()
+last_load = {"hit": False, "seconds": 0.0, "rows": 0}
+
+
+def _signature(path):
+    stat = os.stat(path)
+    version = library_version(path)
+    if version is not None:
+        # Counted by triggers on tracks, so saving a setlist keeps the cache;
+        # the inode tells a replaced file apart
+        return stat.st_ino, version
+    # The loader uses WAL mode: while any connection is open, writes land
+    # in the -wal file and the db file itself does not change
+    try:
+        wal = os.stat(path + "-wal")
+        return stat.st_mtime_ns, stat.st_size, wal.st_mtime_ns, wal.st_size
+    except OSError:
+        return stat.st_mtime_ns, stat.st_size
+
+
+def load_library(path=DB_PATH):
+    """The Library for `path`, rebuilt only when the db file changes.
+
+    Keyed on the tracks version counter (the file's mtime and size for a
+    database without one), so a Streamlit rerun costs one stat() and one
+    small query, and saving a setlist does not reload. At most MAX_CACHED db files are kept, least recently used
+    first out. last_load records whether this call hit the cache and how
+    long it took.
+    """
+    start = time.perf_counter()
+    key = os.path.realpath(path)
+    signature = _signature(path)
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == signature:
+            _cache.move_to_end(key)
+            library = entry[1]
+            last_load.update(hit=True, seconds=time.perf_counter() - start, rows=len(library.df))
+            return library
+
+    import pandas as pd
+
+    with span("load_library") as stage:
+        with closing(sqlite3.connect(path)) as conn:
+            df = pd.read_sql_query("SELECT rowid AS track_id, * FROM tracks", conn, index_col="track_id")
+        stage.count("tracks", len(df))
+    with span("library_index"):
+        library = Library(df, time.perf_counter() - start, path)
+
+    with _lock:
+        _cache[key] = (signature, library)
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+        last_load.update(hit=False, seconds=time.perf_counter() - start, rows=len(df))
+    return library
@@ -1,181 +1,47 @@
-import re
-import random
-from collections import defaultdict
+import argparse
 from datetime import datetime, timedelta
-import sqlite3
-import pandas as pd
 import os
 
-# --- Scoring Function ---
-def score_track(row, vibe):
-    bpm = row['bpm']
-    genre = str(row['genre']).strip().lower()
-    score = 0
+import instrument
+from candidates import generate_best_of
+from core import estimate_track_duration, score_tracks
+from query import load_candidates
+from transitions import get_transition_store
+from vibes import DEFAULT_MIX_RATIO, get_profile, vibe_labels
 
-    exclusions = {
-        "frat party": ["rock", "afro house"],
-        "sunset": [
-            "pop", "rap", "rap/hiphop", "hip hop", "hip-hop & rap",
-            "electronica", "pitbull", "jersey club", "tiesto"
-        ]
-    }
-
-    excluded = exclusions.get(vibe.lower(), [])
-    if any(g.lower() in genre for g in excluded):
-        return 0
-
-    if vibe.lower() == "frat party":
-        if "pop" in genre:
-            score += 3
-        if 120 <= bpm <= 135:
-            score += 2
-        elif 100 <= bpm < 120 or 136 <= bpm <= 150:
-            score += 1
-
-    elif vibe.lower() == "sunset":
-        if 95 <= bpm <= 118:
-            score += 2
-        elif 85 <= bpm < 95 or 119 <= bpm <= 130:
-            score += 1
-
-    # Add slight randomness to break ties in score
-    score += random.uniform(0, 0.3)
-    return score
-
-# --- Camelot Logic ---
-def parse_key(k):
-    match = re.match(r"^(\d{1,2})([AB])$", str(k).strip().upper())
-    return (int(match.group(1)), match.group(2)) if match else (None, None)
-
-def get_harmonic_neighbors(key):
-    num, mode = parse_key(key)
-    if num is None:
-        return []
-    neighbors = [f"{num}{mode}"]
-    neighbors.append(f"{num}{'B' if mode == 'A' else 'A'}")
-    neighbors.append(f"{(num % 12) + 1}{mode}")
-    neighbors.append(f"{(num - 2) % 12 + 1}{mode}")
-    return neighbors
-
-# --- Filter by Key Zones ---
-def filter_by_camelot_zone(tracks, key_range):
-    result = []
-    for t in tracks:
-        key = t.get("key", "").strip().upper()
-        num, _ = parse_key(key)
-        if num and num in key_range:
-            result.append(t)
-    return result
-
-# --- Load Transitions ---
-def load_transitions():
-    transition_db_path = os.path.join("..", "transition_manager", "song_transitions.db")
-    conn = sqlite3.connect(transition_db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT from_artist, from_title, to_artist, to_title FROM transitions")
-    rows = cursor.fetchall()
-    conn.close()
-
-    transition_pairs = set()
-    for from_artist, from_title, to_artist, to_title in rows:
-        key = ((from_artist.lower(), from_title.lower()), (to_artist.lower(), to_title.lower()))
-        transition_pairs.add(key)
-    return transition_pairs
-
-# --- DAG Longest Path Setlist Builder ---
-def build_harmonic_graph_setlist(scored_tracks, total_duration_seconds, use_auto_segmentation=True, transitions=None):
-    df = [t for t in scored_tracks if t['vibe_score'] > 0 and t['key']]
-
-    if use_auto_segmentation:
-        build_time = 1800  # 30 minutes for build-up
-        remaining_time = total_duration_seconds - build_time
-        main_time = remaining_time * 0.6
-        peak_time = remaining_time * 0.4
-
-        segments = [
-            (filter_by_camelot_zone(df, range(1, 5)), build_time),
-            (filter_by_camelot_zone(df, range(5, 9)), main_time),
-            (filter_by_camelot_zone(df, range(9, 13)), peak_time)
-        ]
-    else:
-        segment_duration = total_duration_seconds / 3
-        segments = [
-            (df, segment_duration),
-            (df, segment_duration),
-            (df, segment_duration)
-        ]
-
-    result = []
-    for segment_tracks, segment_time in segments:
-        if not segment_tracks:
-            continue
-        random.shuffle(segment_tracks)
-        segment_result = build_segment_graph(segment_tracks, segment_time, transitions)
-        result.extend(segment_result)
-
-    return result
-
-# --- Segment Path Logic ---
-def build_segment_graph(tracks, total_duration_seconds, transitions=None):
-    durations = [estimate_track_duration(t) for t in tracks]
-    n = len(tracks)
-    graph = [[] for _ in range(n)]
-
-    for i in range(n):
-        key1 = tracks[i]['key'].strip().upper()
-        bpm1 = tracks[i]['bpm']
-        for j in range(n):
-            if i == j:
-                continue
-            key2 = tracks[j]['key'].strip().upper()
-            bpm2 = tracks[j]['bpm']
-            if key2 in get_harmonic_neighbors(key1) and abs(bpm1 - bpm2) <= 25:
-                if transitions:
-                    from_pair = (tracks[i]['artist'].lower(), tracks[i]['track_title'].lower())
-                    to_pair = (tracks[j]['artist'].lower(), tracks[j]['track_title'].lower())
-                    if (from_pair, to_pair) in transitions:
-                        graph[i].append(j)
-                        continue
-                graph[i].append(j)
-        random.shuffle(graph[i])  # Randomize neighbors
-
-    dp = [(durations[i], [i]) for i in range(n)]
-    for i in range(n):
-        for j in graph[i]:
-            new_time = dp[i][0] + durations[j]
-            if new_time <= total_duration_seconds and new_time > dp[j][0]:
-                dp[j] = (new_time, dp[i][1] + [j])
-
-    best_path_indices = max(dp, key=lambda x: (x[0] <= total_duration_seconds, x[0], random.random()))[1]
-    return [tracks[i] for i in best_path_indices]
+CANDIDATES = 8  # setlists generated in parallel; the best one is printed
 
 # --- Utility Functions ---
-def estimate_track_duration(row, ratio=0.7):
-    try:
-        if 'time' in row and isinstance(row['time'], str) and ':' in row['time']:
-            m, s = map(int, row['time'].split(':'))
-            total = m * 60 + s
-        else:
-            total = 210
-    except:
-        total = 210
-    return int(total * ratio)
-
-def print_timestamped_setlist(start_time, setlist):
+def print_timestamped_setlist(start_time, setlist, mix_ratio=DEFAULT_MIX_RATIO):
     current = start_time
     for track in setlist:
         print(f"{current.strftime('%H:%M')} | {track['track_title']} — {track['artist']} | {track['bpm']} BPM | Key {track['key']}")
-        duration = estimate_track_duration(track)
+        duration = estimate_track_duration(track, mix_ratio)
         current += timedelta(seconds=duration)
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a DJ setlist interactively.")
+    parser.add_argument("--profile", nargs="?", const="", metavar="TRACE",
+                        help=f"print a per-stage timing breakdown; with TRACE, also write a Chrome trace "
+                             f"there (or set {instrument.PROFILE_ENV}=1 and {instrument.TRACE_ENV}=path)")
+    return parser.parse_args(argv)
+
+def report_profile(trace_path=None):
+    print("\n⏱️ Stage breakdown:\n" + instrument.format_summary(instrument.summary()))
+    if trace_path:
+        instrument.write_trace(trace_path)
+        print(f"Trace written to {trace_path}")
+
 # --- Main Function ---
-def main():
-    conn = sqlite3.connect("dj_tracks.db")
-    df = pd.read_sql_query("SELECT * FROM tracks", conn)
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile is not None:
+        instrument.enable()
+    trace_path = args.profile or os.environ.get(instrument.TRACE_ENV)
 
     start_str = input("Enter set start time (HH:MM): ")
     end_str = input("Enter set end time (HH:MM): ")
-    vibe = input("Enter vibe (e.g. Frat Party, Sunset): ").strip()
+    vibe = input(f"Enter vibe ({', '.join(vibe_labels())}): ").strip()
     segmentation_mode = input("Segment manually? (y/n): ").strip().lower()
     use_auto = segmentation_mode != 'y'
 
@@ -185,20 +51,30 @@ def main():
         end_time += timedelta(days=1)
 
     total_duration = (end_time - start_time).total_seconds()
-    df['vibe_score'] = df.apply(lambda row: score_track(row, vibe), axis=1)
-
-    transitions = load_transitions()
-    best_set = build_harmonic_graph_setlist(
-        df.to_dict('records'),
-        total_duration_seconds=total_duration,
-        use_auto_segmentation=use_auto,
-        transitions=transitions
-    )
+    profile = get_profile(vibe)
+    # Only rows this vibe can place are read from the database
+    tracks = score_tracks(load_candidates(vibe), vibe)
+
+    transitions = get_transition_store()
+    with instrument.span("generate") as stage:
+        best = generate_best_of(
+            CANDIDATES,
+            tracks,
+            total_duration_seconds=total_duration,
+            use_auto_segmentation=use_auto,
+            transitions=transitions,
+            mix_ratio=profile.mix_ratio
+        )
+        stage.count("candidates", CANDIDATES)
+    best_set = best.setlist
 
     print(f"\n🕒 Set duration: {end_time - start_time}")
     print(f"🎧 Vibe selected: {vibe}\n")
     print("🎶 Generated Setlist:\n" + "-" * 50)
-    print_timestamped_setlist(start_time, best_set)
+    print_timestamped_setlist(start_time, best_set, profile.mix_ratio)
+
+    if instrument.enabled():
+        report_profile(trace_path)
 
 if __name__ == "__main__":
     main()
@@ -1,257 +1,140 @@
-import re
-import random
-from collections import defaultdict, Counter
+from collections import Counter
+from contextlib import closing
 from datetime import datetime, timedelta
-import sqlite3
-import pandas as pd
-import os
+import time
+import numpy as np
 import streamlit as st
 
+import instrument
+from export import FORMATS, Playlist, render
+from genres import default_taxonomy
+from library import last_load, load_library
+from planner import estimate_track_duration, stream_harmonic_graph_setlist
+from repair import insert_track, remove_track
+from scoring import score_library
+from setlists import load_setlist, open_store, save_setlist, setlist_names
+from track_table import TrackTable
+from transitions import fold, get_transition_store
+from vibes import DEFAULT_MIX_RATIO, get_profile, vibe_labels
+
+ENGINES = {"Longest playtime (DP)": "dp", "Beam search": "beam", "Simulated annealing": "anneal"}
+EXPORTS = {"CSV": "csv", "M3U8 playlist": "m3u8", "rekordbox XML": "rekordbox"}
+GENERATE_SECONDS = 5  # wall-time cap on one generation; the best set so far is kept
+
+
+def render_timeline(start_time, tracks, mix_ratio=DEFAULT_MIX_RATIO):
+    lines = []
+    current = start_time
+    for track in tracks:
+        lines.append(f"- **{current.strftime('%H:%M')}** | {track['track_title']} — {track['artist']} | {track['bpm']} BPM | Key {track['key']}")
+        current += timedelta(seconds=estimate_track_duration(track, mix_ratio))
+    return "\n".join(lines)
+
+def set_seconds(start, end):
+    start_time = datetime.combine(datetime.today(), start)
+    end_time = datetime.combine(datetime.today(), end)
+    if end_time <= start_time:
+        end_time += timedelta(days=1)
+    return (end_time - start_time).total_seconds()
 
-def score_track(row, vibe):
-    bpm = row['bpm']
-    genre = str(row['genre']).strip().lower()
-    score = 0
-
-    #Inclusions were more difficult to isolate so incorpoated exclusions
-    exclusions = {
-        "frat party": ["rock", "afro house"],
-        "sunset": [
-            "pop", "rap", "rap/hiphop", "hip hop", "hip-hop & rap",
-            "electronica", "pitbull", "jersey club", "tiesto"
-        ],
-        "kickback": ["rock", "rap", "rap/hiphop", "hip hop", "hip-hop"],
-        "rave": [
-            "r&b", "indie pop", "latin pop", "latin music", "hip hop", "hip hop/rap", "pop", 
-            "r & b", "demi lovato"
-        ],
-        "house": [
-            "rap", "hip hop", "hip-hop & rap", "rap/hip-hop", "rock", "pitbull", 
-            "jersey club",  "demi lovato", "r & b"
-        ],
-        "poolside": [
-            "rock", "trap", "drill", "metal","jersey club", "travis scott", "pitbull",
-        ]
-    }
-
-
-    excluded = exclusions.get(vibe.lower(), [])
-    #drafted a scoring tool in order to priortize the songs
-    if any(g.lower() in genre for g in excluded):
-        return 0
-
-    if vibe.lower() == "frat party":
-        if "pop" in genre:
-            score += 3
-        if 120 <= bpm <= 135:
-            score += 2
-        elif 100 <= bpm < 120 or 136 <= bpm <= 150:
-            score += 1
-
-    elif vibe.lower() == "sunset":
-        if 95 <= bpm <= 118:
-            score += 2
-        elif 85 <= bpm < 95 or 119 <= bpm <= 130:
-            score += 1
-    elif vibe.lower() == "kick back":
-        if 120 <= bpm <= 135:
-            score += 2
-        elif 100 <= bpm < 120 or 136 <= bpm <= 150:
-            score += 1
-    elif vibe.lower() == "rave":
-        if 125 <= bpm <= 140:
-            score += 2
-        elif 120 <= bpm < 125 or 141 <= bpm <= 150:
-            score += 1
-        if "techno" in genre or "trance" in genre or "hard" in genre:
-            score += 2
-
-    elif vibe.lower() == "house":
-        if "house" in genre:
-            score += 2
-        if 118 <= bpm <= 130:
-            score += 2
-        elif 110 <= bpm < 118 or 131 <= bpm <= 138:
-            score += 1
-
-    elif vibe.lower() == "poolside":
-        if "chill" in genre or "tropical" in genre or "deep house" in genre:
-            score += 2
-        if 100 <= bpm <= 118:
-            score += 2
-        elif 85 <= bpm < 100 or 119 <= bpm <= 125:
-            score += 1
-
-
-    score += random.uniform(0, 0.3)
-    return score
-
-#tool to key match
-def parse_key(k):
-    match = re.match(r"^(\d{1,2})([AB])$", str(k).strip().upper())
-    return (int(match.group(1)), match.group(2)) if match else (None, None)
-
-def get_harmonic_neighbors(key):
-    num, mode = parse_key(key)
-    if num is None:
-        return []
-    neighbors = [f"{num}{mode}"]
-    neighbors.append(f"{num}{'B' if mode == 'A' else 'A'}")
-    neighbors.append(f"{(num % 12) + 1}{mode}")
-    neighbors.append(f"{(num - 2) % 12 + 1}{mode}")
-    return neighbors
-
-def filter_by_camelot_zone(tracks, key_range):
-    result = []
-    for t in tracks:
-        key = t.get("key", "").strip().upper()
-        num, _ = parse_key(key)
-        if num and num in key_range:
-            result.append(t)
-    return result
-
-
-def load_transitions():
-    return set()
-
-
-def build_harmonic_graph_setlist(scored_tracks, total_duration_seconds, use_auto_segmentation=True, transitions=None):
-    df = [t for t in scored_tracks if t['vibe_score'] > 0 and t['key']]
-
-    if use_auto_segmentation:
-        build_time = 1800
-        remaining_time = total_duration_seconds - build_time
-        main_time = remaining_time * 0.6
-        peak_time = remaining_time * 0.4
-
-        segments = [
-            (filter_by_camelot_zone(df, range(1, 5)), build_time),
-            (filter_by_camelot_zone(df, range(5, 9)), main_time),
-            (filter_by_camelot_zone(df, range(9, 13)), peak_time)
-        ]
-    else:
-        segment_duration = total_duration_seconds / 3
-        segments = [
-            (df, segment_duration),
-            (df, segment_duration),
-            (df, segment_duration)
-        ]
-
-    result = []
-    for segment_tracks, segment_time in segments:
-        if not segment_tracks:
-            continue
-        random.shuffle(segment_tracks)
-        segment_result = build_segment_graph(segment_tracks, segment_time, transitions)
-        result.extend(segment_result)
-
-    return result
-
-
-def build_segment_graph(tracks, total_duration_seconds, transitions=None):
-    durations = [estimate_track_duration(t) for t in tracks]
-    n = len(tracks)
-    graph = [[] for _ in range(n)]
-
-    for i in range(n):
-        key1 = tracks[i]['key'].strip().upper()
-        bpm1 = tracks[i]['bpm']
-        for j in range(n):
-            if i == j:
-                continue
-            key2 = tracks[j]['key'].strip().upper()
-            bpm2 = tracks[j]['bpm']
-            if key2 in get_harmonic_neighbors(key1) and abs(bpm1 - bpm2) <= 25:
-                graph[i].append(j)
-        random.shuffle(graph[i])
-
-    dp = [(durations[i], [i]) for i in range(n)]
-    for i in range(n):
-        for j in graph[i]:
-            new_time = dp[i][0] + durations[j]
-            if new_time <= total_duration_seconds and new_time > dp[j][0]:
-                dp[j] = (new_time, dp[i][1] + [j])
-
-    best_path_indices = max(dp, key=lambda x: (x[0] <= total_duration_seconds, x[0], random.random()))[1]
-    return [tracks[i] for i in best_path_indices]
-
-
-def estimate_track_duration(row, ratio=0.7):
-    try:
-        if 'time' in row and isinstance(row['time'], str) and ':' in row['time']:
-            m, s = map(int, row['time'].split(':'))
-            total = m * 60 + s
-        else:
-            total = 210
-    except:
-        total = 210
-    return int(total * ratio)
-
-def summarize_stats(setlist):
-    print(setlist[0])
-    if not setlist:
+def summarize_stats(setlist, mix_ratio=DEFAULT_MIX_RATIO):
+    if not len(setlist):
         return
-    avg_bpm = sum(t['bpm'] for t in setlist) / len(setlist)
-    genres = Counter(t['genre'].lower() for t in setlist if t.get('genre'))
-    total_time = sum(estimate_track_duration(t) for t in setlist) / 60
+    # Spellings of one genre ("Hip Hop", "Rap/HipHop") are counted together
+    taxonomy = default_taxonomy()
+    if isinstance(setlist, TrackTable):
+        avg_bpm = float(setlist.bpm.mean())
+        # The table's genre ids index its raw genre strings; each string is
+        # mapped once, and a missing genre (-1) lands in the trailing slot
+        to_taxonomy = np.array([taxonomy.id_for(g) for g in setlist.genres] + [-1], dtype=np.int64)
+        genre_ids = to_taxonomy[setlist.genre_id]
+        genres = Counter(dict(enumerate(np.bincount(genre_ids[genre_ids >= 0]).tolist())))
+        total_time = int(setlist.play_durations(mix_ratio).sum()) / 60
+    else:
+        avg_bpm = sum(t['bpm'] for t in setlist) / len(setlist)
+        genres = Counter(taxonomy.id_for(t.get('genre')) for t in setlist)
+        total_time = sum(estimate_track_duration(t, mix_ratio) for t in setlist) / 60
     st.markdown(f"**Average BPM:** {avg_bpm:.1f}")
     st.markdown(f"**Total Playtime:** {total_time:.1f} minutes")
     st.markdown("**Genre Breakdown:**")
-    for genre, count in genres.items():
-        st.markdown(f"- {genre.title()}: {count} song(s)")
+    for genre_id, count in genres.items():
+        if genre_id is not None and count:
+            st.markdown(f"- {taxonomy.names[genre_id].title()}: {count} song(s)")
 
-def export_setlist_to_csv(setlist, filename="setlist_export.csv"):
-    df = pd.DataFrame(setlist)
-    df.to_csv(filename, index=False)
-    st.download_button("Download Setlist", data=df.to_csv(index=False), file_name=filename, mime='text/csv')
+def export_setlist(setlist, fmt, name="Setlist"):
+    """Download button for the set, serialized once in the chosen format."""
+    start_time = datetime.combine(datetime.today(), start_str)
+    extension, mime = FORMATS[fmt]
+    data = render([Playlist(name, setlist, start_time, mix_ratio)], fmt)
+    st.download_button("Download Setlist", data=data, file_name=f"setlist_export.{extension}", mime=mime)
 
 
 def save_setlist_to_db(name, setlist):
     if not name or not setlist:
         return
-    path = "saved_setlists.csv"
-    rows = []
-    for track in setlist:
-        track_copy = track.copy()
-        track_copy['name'] = name
-        rows.append(track_copy)
-    df = pd.DataFrame(rows)
-    if os.path.exists(path):
-        df.to_csv(path, mode='a', header=False, index=False)
-    else:
-        df.to_csv(path, index=False)
+    with closing(open_store()) as conn:
+        unmatched = save_setlist(conn, name, list(setlist))
     st.success(f"Setlist '{name}' saved!")
+    if unmatched:
+        st.info(f"{unmatched} song(s) are not in the library and were saved as entered.")
 
-def load_saved_setlists():
-    path = "saved_setlists.csv"
-    if os.path.exists(path):
-        return pd.read_csv(path)
-    return pd.DataFrame()
+def load_saved_setlist_names():
+    with closing(open_store()) as conn:
+        return setlist_names(conn)
 
 st.title("Smart DJ Setlist Generator")
 
 start_str = st.time_input("Set Start Time", value=datetime.strptime("01:00", "%H:%M").time())
 end_str = st.time_input("Set End Time", value=datetime.strptime("03:00", "%H:%M").time())
-vibe = st.selectbox("Select Vibe", [ "Sunset", "Kick back", "Rave", "House", "Poolside", "Frat Party"])
+vibe = st.selectbox("Select Vibe", vibe_labels())
+mix_ratio = get_profile(vibe).mix_ratio
 segment_auto = st.checkbox("Auto Segment by Energy Curve", value=True)
+engine = ENGINES[st.selectbox("Planner", list(ENGINES))]
+
+library = load_library()
 
-conn = sqlite3.connect("dj_tracks.db")
-df = pd.read_sql_query("SELECT * FROM tracks", conn)
-existing_titles = df['track_title'].dropna().unique().tolist()
+with st.sidebar.expander("Library cache"):
+    st.markdown(f"**Cache:** {'hit' if last_load['hit'] else 'miss'}")
+    st.markdown(f"**Load time:** {last_load['seconds'] * 1000:.2f} ms")
+    st.markdown(f"**Tracks:** {last_load['rows']}")
+
+with st.sidebar.expander("Profiling"):
+    if st.checkbox("Time generation stages", value=instrument.enabled()):
+        instrument.enable()
+    else:
+        instrument.disable()
+    for stage in st.session_state.get('profile', []):
+        counters = ", ".join(f"{k}={v:,}" for k, v in stage['counters'].items())
+        st.markdown(f"**{stage['name']}** ({stage['calls']}×): {stage['seconds'] * 1000:.1f} ms" + (f"  \n{counters}" if counters else ""))
 
 
 if st.button("Generate Setlist"):
+    instrument.drain()
     start_time = datetime.combine(datetime.today(), start_str)
-    end_time = datetime.combine(datetime.today(), end_str)
-    if end_time <= start_time:
-        end_time += timedelta(days=1)
-
-    df['vibe_score'] = df.apply(lambda row: score_track(row, vibe), axis=1)
-    total_duration = (end_time - start_time).total_seconds()
-    transitions = load_transitions()
-    best_set = build_harmonic_graph_setlist(df.to_dict('records'), total_duration_seconds=total_duration, use_auto_segmentation=segment_auto, transitions=transitions)
+    # Only the rows this vibe can place are scored and planned
+    positions = library.candidate_positions(vibe)
+    scored = library.table.take(positions).with_scores(score_library(library.df.iloc[positions], vibe))
+    total_duration = set_seconds(start_str, end_str)
+    transitions = get_transition_store()
+    deadline = time.perf_counter() + GENERATE_SECONDS
+
+    # Finished segments are shown as soon as they are planned; the running
+    # segment's best-so-far is redrawn under them until it is final
+    preview = st.empty()
+    finished, running = [], []
+    for update in stream_harmonic_graph_setlist(scored, total_duration_seconds=total_duration, use_auto_segmentation=segment_auto, transitions=transitions, mix_ratio=mix_ratio, engine=engine, deadline=deadline):
+        if update.final:
+            finished.extend(update.tracks)
+            running = []
+        else:
+            running = update.tracks
+        status = "planned" if update.final else "refining"
+        preview.markdown(render_timeline(start_time, finished + running, mix_ratio) + f"\n\n_{update.name}: {status}_")
+    preview.empty()
 
-    st.session_state.edited_set = best_set
+    st.session_state.edited_set = finished
+    if instrument.enabled():
+        st.session_state.profile = instrument.summary(instrument.drain())
 
 st.markdown("### Outputted Setlist")
 if 'edited_set' in st.session_state:
@@ -259,13 +142,13 @@ if 'edited_set' in st.session_state:
     for i, track in enumerate(st.session_state.edited_set):
         with st.container():
             st.markdown(f"**{current_time.strftime('%H:%M')}** | {track['track_title']} — {track['artist']} | {track['bpm']} BPM | Key {track['key']}", help=f"Genre: {track.get('genre', '')}")
-            current_time += timedelta(seconds=estimate_track_duration(track))
+            current_time += timedelta(seconds=estimate_track_duration(track, mix_ratio))
             remove = st.button(f"Remove", key=f"remove_{i}")
             if remove:
-                st.session_state.edited_set.pop(i)
+                st.session_state.edited_set = remove_track(st.session_state.edited_set, i, library, set_seconds(start_str, end_str), mix_ratio)
                 st.rerun()
 
-    summarize_stats(st.session_state.edited_set)
+    summarize_stats(st.session_state.edited_set, mix_ratio)
     st.markdown("---")
     name_to_save = st.text_input("Name this Setlist")
     if st.button(" Save Setlist"):
@@ -273,9 +156,12 @@ if 'edited_set' in st.session_state:
 
 st.markdown("---")
 st.markdown("###  Add a New Song")
-new_title = st.selectbox("Track Title", options=[""] + existing_titles)
+search_text = st.text_input("Search the library", placeholder="Title or artist, typos welcome")
+matches = library.find(search_text)
+match = st.selectbox("Matches", options=[None] + matches, format_func=lambda p: "" if p is None else f"{library.df['track_title'].iat[p]} — {library.df['artist'].iat[p]}")
 
-matched_row = df[df['track_title'] == new_title].iloc[0] if new_title in df['track_title'].values else None
+matched_row = None if match is None else library.df.iloc[match]
+new_title = st.text_input("Track Title", value=matched_row['track_title'] if matched_row is not None else search_text)
 new_artist = st.text_input("Artist", value=matched_row['artist'] if matched_row is not None else "")
 new_bpm = st.number_input("BPM", min_value=60.0, max_value=180.0, value=float(matched_row['bpm']) if matched_row is not None else 120.0)
 new_key = st.text_input("Camelot Key (e.g. 6A, 5B)", value=matched_row['key'] if matched_row is not None else "")
@@ -285,11 +171,8 @@ if st.button("Add Song to Setlist"):
     if 'edited_set' not in st.session_state:
         st.session_state.edited_set = []
 
-    if any(
-        song['track_title'].lower() == new_title.lower() and 
-        song['artist'].lower() == new_artist.lower()
-        for song in st.session_state.edited_set
-    ):
+    in_set = {(fold(song.get('artist')), fold(song.get('track_title'))) for song in st.session_state.edited_set}
+    if (fold(new_artist), fold(new_title)) in in_set:
         st.warning(f"⚠️ '{new_title}' by {new_artist} is already in the setlist.")
     else:
         new_track = {
@@ -301,16 +184,7 @@ if st.button("Add Song to Setlist"):
             "vibe_score": 2
         }
 
-        inserted = False
-        for i in range(len(st.session_state.edited_set)):
-            curr_key = st.session_state.edited_set[i]['key'].strip().upper()
-            if new_key.strip().upper() in get_harmonic_neighbors(curr_key):
-                st.session_state.edited_set.insert(i + 1, new_track)
-                inserted = True
-                break
-
-        if not inserted:
-            st.session_state.edited_set.append(new_track)
+        st.session_state.edited_set, _ = insert_track(st.session_state.edited_set, new_track, set_seconds(start_str, end_str), mix_ratio)
 
         st.success(f"✅ '{new_title}' added to setlist!")
         st.rerun()
@@ -321,16 +195,16 @@ if st.button("Save Setlist", key="save_setlist_button"):
     save_setlist_to_db(name_to_save, st.session_state.edited_set)
 
 st.markdown("---")
-if st.session_state.edited_set:
-    if st.button("Export Setlist as CSV", key="export_setlist_button"):
-        export_setlist_to_csv(st.session_state.edited_set)
+if st.session_state.get('edited_set'):
+    export_format = EXPORTS[st.selectbox("Export format", list(EXPORTS), key="export_format")]
+    export_setlist(st.session_state.edited_set, export_format, st.session_state.get('loaded_setlist') or "Setlist")
 
 st.markdown("### Load Saved Setlist")
-saved_df = load_saved_setlists()
-if not saved_df.empty:
-    names = saved_df['name'].unique().tolist()
-    chosen_name = st.selectbox("Choose Saved Setlist", options=[""] + names)
-    if chosen_name:
-        loaded = saved_df[saved_df['name'] == chosen_name].to_dict('records')
-        st.session_state.edited_set = loaded
+saved_names = load_saved_setlist_names()
+if saved_names:
+    chosen_name = st.selectbox("Choose Saved Setlist", options=[""] + saved_names)
+    if chosen_name and st.session_state.get('loaded_setlist') != chosen_name:
+        with closing(open_store()) as conn:
+            st.session_state.edited_set = load_setlist(conn, chosen_name)
+        st.session_state.loaded_setlist = chosen_name
         st.rerun()
@@ -0,0 +1,262 @@
+import heapq
+import math
+import random
+import time
+from array import array
+
+from camelot import DISTANCE, KEYS
+from path_engine import TRANSITION_BONUS, longest_path, trace_path
+
+# Every term is in seconds of value, like TRANSITION_BONUS in path_engine
+OBJECTIVE_WEIGHTS = {
+    "fill": 1.0,                      # per second of playtime
+    "vibe": 20.0,                     # per vibe_score point of each track played
+    "bpm": 2.0,                       # penalty per BPM of jump between neighbours
+    "camelot": 15.0,                  # penalty per step round the wheel (a mode switch is one step)
+    "transitions": TRANSITION_BONUS,  # per recorded transition used
+}
+BEAM_WIDTH = 32
+ANNEAL_BUDGET_MS = 200
+ANNEAL_START_TEMP = 60.0
+ANNEAL_END_TEMP = 0.5
+CLOCK_EVERY = 64  # annealing moves between clock reads
+
+
+# --- Segment Problem ---
+class Segment:
+    """One segment's planning problem, shared by every engine.
+
+    graph[i] lists the j that may follow track i. Edges only go up in
+    energy `rank`, so any walk along them is a path with no repeats. The
+    objective is additive: a value per track plus a value per adjacent
+    pair, which lets beam search score paths incrementally.
+    """
+
+    def __init__(self, durations, vibe_scores, bpms, key_codes, graph, rank, budget, preferred=None, weights=None):
+        self.durations = list(durations)
+        self.graph = graph
+        self.rank = rank
+        self.budget = budget
+        self.bpms = bpms
+        self.key_codes = key_codes  # camelot codes 0..23, NO_KEY (-1) if unknown
+        self.preferred = preferred or {}
+        self.weights = dict(OBJECTIVE_WEIGHTS, **(weights or {}))
+
+        w = self.weights
+        self.node_values = [
+            w["fill"] * d + w["vibe"] * v for d, v in zip(self.durations, vibe_scores)
+        ]
+        self._predecessors = None
+        self._successors = None
+
+    def __len__(self):
+        return len(self.durations)
+
+    def edge_value(self, i, j):
+        w = self.weights
+        value = -w["bpm"] * abs(self.bpms[i] - self.bpms[j])
+        a, b = self.key_codes[i], self.key_codes[j]
+        if a >= 0 and b >= 0:
+            value -= w["camelot"] * DISTANCE[a * KEYS + b]
+        if j in self.preferred.get(i, ()):
+            value += w["transitions"]
+        return value
+
+    def path_value(self, path):
+        if not path:
+            return 0.0
+        value = sum(self.node_values[i] for i in path)
+        return value + sum(self.edge_value(i, j) for i, j in zip(path, path[1:]))
+
+    def path_time(self, path):
+        return sum(self.durations[i] for i in path)
+
+    @property
+    def successors(self):
+        if self._successors is None:
+            self._successors = [frozenset(g) for g in self.graph]
+        return self._successors
+
+    @property
+    def predecessors(self):
+        if self._predecessors is None:
+            self._predecessors = [[] for _ in self.graph]
+            for i, targets in enumerate(self.graph):
+                for j in targets:
+                    self._predecessors[j].append(i)
+        return self._predecessors
+
+
+# --- Beam Search ---
+def beam_search(segment, width=BEAM_WIDTH, rng=random, deadline=None):
+    """Yield (value, path) each time the best path found so far improves.
+
+    Every step extends the `width` best partial paths by one track. Only
+    the best partial path ending on each track is kept, and a path is
+    stored as a parent pointer into a history of width-bounded steps, so
+    memory grows with width times path length, not with the library.
+    Stops after the step that passes `deadline` (a perf_counter value).
+    """
+    n = len(segment)
+    if n == 0:
+        return
+    durations, budget = segment.durations, segment.budget
+    node_values = segment.node_values
+
+    nodes = array('i')
+    parents = array('i')
+
+    def push(node, parent):
+        nodes.append(node)
+        parents.append(parent)
+        return len(nodes) - 1
+
+    starts = [i for i in range(n) if durations[i] <= budget]
+    starts = heapq.nlargest(width, starts, key=lambda i: (node_values[i], rng.random()))
+    beam = [(node_values[i], durations[i], push(i, -1)) for i in starts]
+
+    best_value = -math.inf
+    while beam:
+        top = max(beam, key=lambda s: s[0])
+        if top[0] > best_value:
+            best_value = top[0]
+            yield best_value, [nodes[s] for s in trace_path(parents, top[2])]
+        if deadline is not None and time.perf_counter() >= deadline:
+            return
+
+        extended = {}
+        for value, played, state in beam:
+            i = nodes[state]
+            for j in segment.graph[i]:
+                new_time = played + durations[j]
+                if new_time > budget:
+                    continue
+                new_value = value + node_values[j] + segment.edge_value(i, j)
+                if j not in extended or new_value > extended[j][0]:
+                    extended[j] = (new_value, new_time, state)
+        kept = heapq.nlargest(width, extended.items(), key=lambda item: item[1][0])
+        beam = [(value, played, push(j, state)) for j, (value, played, state) in kept]
+
+
+# --- Simulated Annealing ---
+def _neighbour(segment, path, played, rng):
+    """A random valid edit of `path` and its playtime, or None if the draw fails."""
+    graph, succ, durations = segment.graph, segment.successors, segment.durations
+    budget = segment.budget
+    k = rng.randrange(len(path))
+    move = rng.randrange(5)
+
+    if move == 0:  # extend at either end
+        if rng.random() < 0.5:
+            options = graph[path[-1]]
+            if options:
+                m = rng.choice(options)
+                if played + durations[m] <= budget:
+                    return path + [m], played + durations[m]
+        else:
+            options = segment.predecessors[path[0]]
+            if options:
+                m = rng.choice(options)
+                if played + durations[m] <= budget:
+                    return [m] + path, played + durations[m]
+    elif move == 1:  # drop a track, if its neighbours can mix into each other
+        if len(path) > 1 and (k in (0, len(path) - 1) or path[k + 1] in succ[path[k - 1]]):
+            return path[:k] + path[k + 1:], played - durations[path[k]]
+    elif move == 2:  # replace a track
+        options = graph[path[k - 1]] if k else segment.predecessors[path[1]] if len(path) > 1 else []
+        if options:
+            m = rng.choice(options)
+            new_time = played - durations[path[k]] + durations[m]
+            if (m != path[k] and new_time <= budget
+                    and (k == 0 or m in succ[path[k - 1]])
+                    and (k == len(path) - 1 or path[k + 1] in succ[m])):
+                return path[:k] + [m] + path[k + 1:], new_time
+    elif move == 3:  # insert a track after position k
+        options = graph[path[k]]
+        if options and k < len(path) - 1:
+            m = rng.choice(options)
+            new_time = played + durations[m]
+            if new_time <= budget and path[k + 1] in succ[m]:
+                return path[:k + 1] + [m] + path[k + 1:], new_time
+    else:  # cut the path at k, keeping the more valuable side
+        if len(path) > 1 and k:
+            head, tail = path[:k], path[k:]
+            if segment.path_value(head) >= segment.path_value(tail):
+                return head, segment.path_time(head)
+            return tail, segment.path_time(tail)
+    return None
+
+
+def anneal(segment, budget_ms=ANNEAL_BUDGET_MS, rng=random, start=None,
+           start_temp=ANNEAL_START_TEMP, end_temp=ANNEAL_END_TEMP, deadline=None):
+    """Yield (value, path) each time the best path found so far improves.
+
+    Starts from `start`, or from the DP longest path, and runs edits for
+    `budget_ms` milliseconds of wall time while the temperature cools
+    geometrically from start_temp to end_temp, or until `deadline` (a
+    perf_counter value) if that comes first. Every edit keeps the path
+    on graph edges and within the segment budget.
+    """
+    if len(segment) == 0:
+        return
+    if start is None:
+        start = list(longest_path(segment.durations, segment.graph, segment.budget, segment.rank,
+                                  rng=rng, preferred=segment.preferred))
+    current = list(start)
+    played = segment.path_time(current)
+    value = segment.path_value(current)
+    best_value = value
+    yield best_value, list(current)
+    if not current:
+        return  # no single track fits the budget
+
+    began = time.perf_counter()
+    stop = began + budget_ms / 1000
+    if deadline is not None:
+        stop = min(stop, deadline)
+    span = max(stop - began, 1e-9)
+    temp = start_temp
+    ratio = end_temp / start_temp
+    moves = 0
+    while True:
+        moves += 1
+        if moves % CLOCK_EVERY == 0:
+            now = time.perf_counter()
+            if now >= stop:
+                return
+            temp = start_temp * ratio ** (1 - (stop - now) / span)
+
+        proposal = _neighbour(segment, current, played, rng)
+        if proposal is None:
+            continue
+        candidate, candidate_time = proposal
+        candidate_value = segment.path_value(candidate)
+        delta = candidate_value - value
+        if delta >= 0 or rng.random() < math.exp(delta / temp):
+            current, played, value = candidate, candidate_time, candidate_value
+            if value > best_value:
+                best_value = value
+                yield best_value, list(current)
+
+
+ENGINES = {
+    "beam": beam_search,
+    "anneal": anneal,
+}
+
+
+def improvements(engine, segment, **options):
+    """Anytime stream of (value, path) from the named engine, best last."""
+    try:
+        search = ENGINES[engine]
+    except KeyError:
+        raise ValueError(f"Unknown engine '{engine}'; expected dp or one of: {', '.join(ENGINES)}") from None
+    return search(segment, **options)
+
+
+def optimize(engine, segment, **options):
+    """Best path the named engine finds for `segment`, as a list of indices."""
+    best = []
+    for _, path in improvements(engine, segment, **options):
+        best = path
+    return best
@@ -0,0 +1,79 @@
+import random
+from array import array
+
+from instrument import count
+
+TRANSITION_BONUS = 60  # seconds of value per recorded transition used
+
+
+# --- Ordering ---
+def energy_rank(bpms, camelot_nums):
+    """Rank of each track by (BPM, Camelot number, position).
+
+    Edges are only followed from a lower rank to a higher one, which makes
+    the symmetric harmonic graph a DAG and lets a segment build in energy.
+    """
+    n = len(bpms)
+    order = sorted(range(n), key=lambda i: (bpms[i], camelot_nums[i], i))
+    rank = array('i', bytes(4 * n))
+    for r, i in enumerate(order):
+        rank[i] = r
+    return rank
+
+
+# --- Longest Duration Path ---
+def longest_path(durations, graph, budget, rank, rng=random, preferred=None, preference=TRANSITION_BONUS):
+    """Indices of the longest-duration path that fits in `budget` seconds.
+
+    One pass in rank order relaxes each edge once. Only the best value,
+    its playtime and a predecessor pointer are kept per track; the path is
+    rebuilt once at the end instead of copying a list on every relaxation.
+    `preferred` maps i to the set of j with a recorded i -> j transition;
+    each such edge adds `preference` seconds to the value, not the playtime.
+    """
+    n = len(durations)
+    if n == 0:
+        return array('i')
+
+    played = array('d', durations)
+    value = array('d', durations)
+    pred = array('i', [-1]) * n
+    rank_of = rank.tolist()  # list reads avoid boxing in the edge loop
+    no_preference = frozenset()
+    relaxations = 0
+    for i in sorted(range(n), key=rank_of.__getitem__):
+        base_time = played[i]
+        if base_time > budget:
+            continue
+        base_value = value[i]
+        rank_i = rank_of[i]
+        liked = preferred.get(i, no_preference) if preferred else no_preference
+        for j in graph[i]:
+            if rank_of[j] > rank_i:
+                new_time = base_time + durations[j]
+                if new_time <= budget:
+                    new_value = base_value + durations[j] + (preference if j in liked else 0)
+                    if new_value > value[j]:
+                        value[j] = new_value
+                        played[j] = new_time
+                        pred[j] = i
+                        relaxations += 1
+    count("relaxations", relaxations)
+
+    end = max(range(n), key=lambda i: (played[i] <= budget, value[i], rng.random()))
+    return trace_path(pred, end)
+
+
+def trace_path(pred, end):
+    # Visited bitset: a predecessor chain can never place a track twice
+    visited = bytearray(len(pred))
+    path = array('i')
+    node = end
+    while node != -1:
+        if visited[node]:
+            raise ValueError(f"Predecessor chain revisits track {node}")
+        visited[node] = 1
+        path.append(node)
+        node = pred[node]
+    path.reverse()
+    return path
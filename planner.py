@@ -0,0 +1,235 @@
+import random
+import sys
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+from camelot import decode, normalize_key
+from durations import track_length
+from harmonic_index import HarmonicIndex
+from instrument import span
+from optimizer import Segment, improvements
+from path_engine import energy_rank, longest_path
+from transitions import fold, transition_adjacency
+from vibes import DEFAULT_MIX_RATIO, DEFAULT_TRACK_SECONDS
+
+SEGMENT_NAMES = ("Build-up", "Main", "Peak")
+SetlistUpdate = namedtuple("SetlistUpdate", ["segment", "name", "tracks", "final"])
+
+def is_table(tracks):
+    """True for a TrackTable, without importing track_table (and NumPy).
+
+    If nothing has imported track_table yet, no value can be a TrackTable.
+    """
+    module = sys.modules.get("track_table")
+    return module is not None and isinstance(tracks, module.TrackTable)
+
+# --- Camelot Logic ---
+def parse_key(k):
+    return decode(normalize_key(k)) or (None, None)
+
+@lru_cache(maxsize=None)
+def _neighbor_names(code):
+    num, mode = decode(code)
+    # Same key, relative major/minor, then one step either way round the wheel
+    order = [(num, mode), (num, 'B' if mode == 'A' else 'A'), (num % 12 + 1, mode), ((num - 2) % 12 + 1, mode)]
+    return tuple(f"{n}{m}" for n, m in order)
+
+def get_harmonic_neighbors(key):
+    code = normalize_key(key)
+    return list(_neighbor_names(code)) if code >= 0 else []
+
+# --- Filter by Key Zones ---
+def filter_by_camelot_zone(tracks, key_range):
+    if is_table(tracks):
+        nums = tracks.camelot_nums()
+        return tracks.take([p for p, num in enumerate(nums.tolist()) if num and num in key_range])
+
+    result = []
+    for t in tracks:
+        # Rows from query.load_candidates carry their stored Camelot number
+        num = t.get("camelot_num")
+        if num is None:
+            code = normalize_key(t.get("key", ""))
+            num = code // 2 + 1 if code >= 0 else None
+        if num and num in key_range:
+            result.append(t)
+    return result
+
+# --- DAG Longest Path Setlist Builder ---
+def build_harmonic_graph_setlist(scored_tracks, total_duration_seconds, use_auto_segmentation=True, transitions=None,
+                                 mix_ratio=DEFAULT_MIX_RATIO, engine="dp", engine_options=None, deadline=None):
+    """Plan a set from a list of track dicts or a TrackTable.
+
+    Either way the result is a list of track dicts; for a table only the
+    chosen rows are materialized. Play durations (track length times
+    `mix_ratio`) are computed once for the candidates and shared by every
+    segment. `engine` picks how each segment is searched: "dp" for the
+    longest-playtime path, or "beam" / "anneal" from optimizer.py, which
+    also weigh vibe score, BPM and key smoothness and recorded transitions.
+    `engine_options` is passed to the optimizer (e.g. width, budget_ms,
+    weights). See stream_harmonic_graph_setlist for `deadline`.
+    """
+    result = []
+    for update in stream_harmonic_graph_setlist(scored_tracks, total_duration_seconds, use_auto_segmentation,
+                                                transitions, mix_ratio, engine, engine_options, deadline):
+        if update.final:
+            result.extend(update.tracks)
+    return result
+
+def stream_harmonic_graph_setlist(scored_tracks, total_duration_seconds, use_auto_segmentation=True, transitions=None,
+                                  mix_ratio=DEFAULT_MIX_RATIO, engine="dp", engine_options=None, deadline=None):
+    """Plan a set segment by segment, yielding a SetlistUpdate as results arrive.
+
+    Each segment yields its improving best-so-far paths (final=False; the
+    optimizer engines only) and then its finished tracks (final=True),
+    before the next segment is planned. `deadline` is a time.perf_counter()
+    value: the running search stops at its best path when it passes, and
+    any later segments fall back to the one-shot "dp" engine so the set
+    is still complete.
+    """
+    if is_table(scored_tracks):
+        df = scored_tracks.take(scored_tracks.candidate_positions())
+    else:
+        df = [t for t in scored_tracks if t['vibe_score'] > 0 and t['key'] and t['bpm'] is not None]
+
+    if use_auto_segmentation:
+        build_time = 1800  # 30 minutes for build-up
+        remaining_time = total_duration_seconds - build_time
+        main_time = remaining_time * 0.6
+        peak_time = remaining_time * 0.4
+
+        segments = [
+            (filter_by_camelot_zone(df, range(1, 5)), build_time),
+            (filter_by_camelot_zone(df, range(5, 9)), main_time),
+            (filter_by_camelot_zone(df, range(9, 13)), peak_time)
+        ]
+    else:
+        segment_duration = total_duration_seconds / 3
+        segments = [
+            (df, segment_duration),
+            (df, segment_duration),
+            (df, segment_duration)
+        ]
+
+    # One flag per candidate track, set once it is placed, so no later
+    # segment can play it again (manual segmentation shares one pool)
+    position = {k: p for p, k in enumerate(_identities(df))}
+    played = bytearray(len(df))
+    durations = play_durations(df, mix_ratio)
+
+    for s, (segment_tracks, segment_time) in enumerate(segments):
+        segment_positions = [position[k] for k in _identities(segment_tracks)]
+        keep = [p for p, pos in enumerate(segment_positions) if not played[pos]]
+        if not keep:
+            continue
+        random.shuffle(keep)
+        segment_durations = [durations[segment_positions[p]] for p in keep]
+        segment_tracks = _subset(segment_tracks, keep)
+        for segment_result, final in iter_segment_graph(segment_tracks, segment_time, transitions,
+                                                        durations=segment_durations, engine=engine,
+                                                        engine_options=engine_options, deadline=deadline):
+            if final:
+                for k in _identities(segment_result):
+                    played[position[k]] = 1
+            yield SetlistUpdate(s, SEGMENT_NAMES[s], _records(segment_result), final)
+
+def _identities(tracks):
+    if is_table(tracks):
+        return tracks.row_id.tolist()
+    return [id(t) for t in tracks]
+
+def _subset(tracks, positions):
+    if is_table(tracks):
+        return tracks.take(positions)
+    return [tracks[p] for p in positions]
+
+def _records(tracks):
+    return tracks.records() if is_table(tracks) else list(tracks)
+
+# --- Segment Path Logic ---
+def build_segment_graph(tracks, total_duration_seconds, transitions=None, index=None, durations=None,
+                        engine="dp", engine_options=None, deadline=None):
+    segment_result = None
+    for segment_result, _ in iter_segment_graph(tracks, total_duration_seconds, transitions, index, durations,
+                                                engine, engine_options, deadline):
+        pass
+    return segment_result
+
+def iter_segment_graph(tracks, total_duration_seconds, transitions=None, index=None, durations=None,
+                       engine="dp", engine_options=None, deadline=None):
+    """Yield (tracks, final) for each improving path, ending with the final one."""
+    n = len(tracks)
+    graph = [[] for _ in range(n)]
+    if durations is None:
+        durations = play_durations(tracks)
+    with span("harmonic_index") as stage:
+        stage.count("tracks", n)
+        if index is None:
+            if is_table(tracks):
+                index = HarmonicIndex.from_arrays(tracks.key_code.tolist(), tracks.bpm.tolist())
+            else:
+                index = HarmonicIndex(tracks)
+
+    preferred = None
+    if transitions:
+        if is_table(tracks):
+            pairs = tracks.name_pairs()
+        else:
+            pairs = [(fold(t.get('artist')), fold(t.get('track_title'))) for t in tracks]
+        preferred = transition_adjacency(transitions, pairs)
+
+    with span("graph_build") as stage:
+        # Only keep edges that go up in energy rank, so the graph is a DAG
+        rank = energy_rank(index.bpms, index.camelot_nums())
+
+        considered = 0
+        for i in range(n):
+            neighbors = index.neighbors(i)
+            considered += len(neighbors)
+            for j in neighbors:
+                if rank[j] > rank[i]:
+                    graph[i].append(j)
+            random.shuffle(graph[i])  # Randomize neighbors
+        if stage:
+            stage.count("edges_considered", considered)
+            stage.count("edges", sum(len(g) for g in graph))
+
+    if engine == "dp" or (deadline is not None and time.perf_counter() >= deadline):
+        with span("path_search") as stage:
+            best_path_indices = longest_path(durations, graph, total_duration_seconds, rank, preferred=preferred)
+            stage.count("tracks_placed", len(best_path_indices))
+        yield _subset(tracks, best_path_indices), True
+        return
+
+    options = dict(engine_options or {}, deadline=deadline)
+    segment = Segment(durations, vibe_scores(tracks), index.bpms, index.key_codes, graph, rank,
+                      total_duration_seconds, preferred, options.pop("weights", None))
+    best_path_indices = []
+    search = improvements(engine, segment, **options)
+    while True:
+        # Timed per step, so the caller's work between updates is not counted
+        with span(f"optimize:{engine}") as stage:
+            step = next(search, None)
+            stage.count("improvements", int(step is not None))
+        if step is None:
+            break
+        best_path_indices = step[1]
+        yield _subset(tracks, best_path_indices), False
+    yield _subset(tracks, best_path_indices), True
+
+
+# --- Utility Functions ---
+def estimate_track_duration(row, ratio=DEFAULT_MIX_RATIO):
+    """Seconds of `row` played before the mix into the next track."""
+    return int((track_length(row) or DEFAULT_TRACK_SECONDS) * ratio)
+
+def vibe_scores(tracks):
+    if is_table(tracks):
+        return tracks.vibe_score.tolist()
+    return [t.get('vibe_score', 0) for t in tracks]
+
+def play_durations(tracks, ratio=DEFAULT_MIX_RATIO):
+    if is_table(tracks):
+        return tracks.play_durations(ratio).tolist()
+    return [estimate_track_duration(t, ratio) for t in tracks]
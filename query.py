@@ -0,0 +1,157 @@
+# Candidate queries: coarse vibe, key and BPM filtering pushed into SQLite.
+# The loader stores each track's Camelot number and mode and its genre's
+# taxonomy id next to the raw text, indexed with BPM, so only rows a vibe
+# can use leave the database. The loader's schema helpers for tracks
+# (indexes, the version counter caches are keyed on) live here too.
+import sqlite3
+from contextlib import closing
+
+from camelot import decode, normalize_key
+from core import DB_PATH, TRACK_COLUMNS, load_tracks
+from genres import stored_taxonomy
+from instrument import span
+from vibes import get_profile
+
+QUERY_COLUMNS = ("camelot_num", "camelot_mode", "genre_id")
+CANDIDATE_COLUMNS = TRACK_COLUMNS + ("camelot_num",)
+
+# Both indexes hold every column the candidate filter reads, so SQLite
+# answers the WHERE clause from the index and visits only matching rows
+INDEXES = {
+    "idx_tracks_camelot_bpm": "tracks (camelot_num, bpm, genre_id)",
+    "idx_tracks_bpm": "tracks (bpm, camelot_num, genre_id)",
+}
+SCAN_SHARE = 0.1  # above this share of the table, a full scan beats fetching rows by index
+
+# Bump library_version on every change to tracks, and only to tracks
+VERSION_TRIGGERS = {
+    "tracks_version_insert": "AFTER INSERT ON tracks",
+    "tracks_version_update": "AFTER UPDATE ON tracks",
+    "tracks_version_delete": "AFTER DELETE ON tracks",
+}
+
+
+# --- Stored Columns ---
+def key_columns(key):
+    """(camelot_num, camelot_mode) stored for a key; (None, None) if it cannot be read."""
+    return decode(normalize_key(key)) or (None, None) if key else (None, None)
+
+
+def has_query_columns(conn):
+    present = {row[1] for row in conn.execute("PRAGMA table_info(tracks)")}
+    # Genre ids from before the taxonomy name raw spellings, not genres.json entries
+    taxonomy = {row[1] for row in conn.execute("PRAGMA table_info(genres)")}
+    return "parent_id" in taxonomy and all(c in present for c in QUERY_COLUMNS)
+
+
+def ensure_version(conn):
+    """Create the tracks version counter and its triggers, if tracks exists."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tracks'").fetchone() is None:
+        return
+    conn.execute("CREATE TABLE IF NOT EXISTS library_version (version INTEGER NOT NULL)")
+    if conn.execute("SELECT 1 FROM library_version").fetchone() is None:
+        conn.execute("INSERT INTO library_version VALUES (0)")
+    for name, event in VERSION_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN UPDATE library_version SET version = version + 1; END")
+
+
+def library_version(path=DB_PATH):
+    """How many times tracks has changed, None for a database without the counter.
+
+    Writes to other tables in the same file (saved setlists) leave it alone.
+    """
+    with closing(sqlite3.connect(path)) as conn:
+        try:
+            row = conn.execute("SELECT version FROM library_version").fetchone()
+        except sqlite3.OperationalError:
+            return None
+    return row[0] if row else None
+
+
+# --- Vibe Filter ---
+def genre_filter(conn, profile):
+    """(excluded ids, boosted ids) among the stored genres, by the profile's genre rules."""
+    taxonomy = stored_taxonomy(conn)
+    stored = list(taxonomy.lineage.items())
+    rules = profile.genre_rules(taxonomy)
+    excluded, boosted = [], []
+    for genre_id, lineage in stored:
+        is_excluded, points = profile.lineage_points(lineage, rules)
+        if is_excluded:
+            excluded.append(genre_id)
+        elif points:
+            boosted.append(genre_id)
+    return excluded, boosted
+
+
+def _ids(values):
+    # Integers from our own tables, so they are inlined rather than bound
+    return ", ".join(str(int(v)) for v in values)
+
+
+def candidate_filter(profile, excluded, boosted, key_range=None, bpm_bands=True):
+    """WHERE clause for the rows `profile` can place, with its bound parameters.
+
+    Keeps rows with a readable key and a BPM, drops excluded genres, and
+    with `bpm_bands` keeps only rows in one of the profile's BPM bands or
+    with a boosted genre; anything else would score only the tie-break
+    jitter. `key_range` limits Camelot numbers, as filter_by_camelot_zone.
+    Excluded artists are left to scoring, which gives them 0, so the count
+    is still answered from the covering index.
+    """
+    where = ["camelot_num IS NOT NULL", "bpm IS NOT NULL"]
+    params = []
+    if key_range is not None:
+        where.append(f"camelot_num IN ({_ids(key_range)})")
+    if excluded:
+        where.append(f"(genre_id IS NULL OR genre_id NOT IN ({_ids(excluded)}))")
+    if bpm_bands and profile.bands:
+        ranges = []
+        for low, high in profile.bands:
+            ranges.append("bpm BETWEEN ? AND ?")
+            params.extend((low, high))
+        if boosted:
+            ranges.append(f"genre_id IN ({_ids(boosted)})")
+        where.append(f"({' OR '.join(ranges)})")
+    return " AND ".join(where), params
+
+
+def _select(conn, columns, where, params):
+    # The filter alone is answered from a covering index, so counting is
+    # cheap; fetching rows through the index only beats a scan for a small slice
+    matches = conn.execute(f"SELECT COUNT(*) FROM tracks WHERE {where}", params).fetchone()[0]
+    total = conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+    source = "tracks NOT INDEXED" if matches > SCAN_SHARE * total else "tracks"
+    return conn.execute(f"SELECT {', '.join(columns)} FROM {source} WHERE {where}", params)
+
+
+def _candidates(conn, vibe, columns, key_range, bpm_bands):
+    profile = get_profile(vibe)
+    where, params = candidate_filter(profile, *genre_filter(conn, profile), key_range, bpm_bands)
+    return _select(conn, columns, where, params)
+
+
+# --- Loading ---
+def load_candidates(vibe, path=DB_PATH, key_range=None, bpm_bands=True):
+    """Track dicts for the rows `vibe` can use, filtered in SQLite.
+
+    A database the loader has not indexed yet (no camelot_num column) is
+    read whole with load_tracks; scoring and the planner filter it as
+    before.
+    """
+    with closing(sqlite3.connect(path)) as conn:
+        if has_query_columns(conn):
+            with span("load_library") as stage:
+                cursor = _candidates(conn, vibe, CANDIDATE_COLUMNS, key_range, bpm_bands)
+                tracks = [dict(zip(CANDIDATE_COLUMNS, row)) for row in cursor]
+                stage.count("tracks", len(tracks))
+            return tracks
+    return load_tracks(path)
+
+
+def candidate_rowids(vibe, path=DB_PATH, key_range=None, bpm_bands=True):
+    """rowids of the rows load_candidates would return, or None for an unindexed database."""
+    with closing(sqlite3.connect(path)) as conn:
+        if not has_query_columns(conn):
+            return None
+        return [row[0] for row in _candidates(conn, vibe, ("rowid",), key_range, bpm_bands)]
@@ -0,0 +1,192 @@
+import heapq
+from itertools import islice
+
+from camelot import compatible as keys_mix, key_name, normalize_key
+from harmonic_index import BPM_WINDOW
+from planner import estimate_track_duration
+from vibes import DEFAULT_MIX_RATIO, DEFAULT_TRACK_SECONDS
+
+REPAIR_WINDOW = 3       # tracks either side of an insert that may be dropped to hold playtime
+MAX_BRIDGE = 2          # library tracks that may fill the gap left by a removal
+BRIDGE_BPM_WINDOW = 8   # BPM either side of a neighbour searched for bridge tracks
+BRANCH = 48             # candidates kept per bridge step, closest BPM first
+EXPAND = 8              # first-step candidates extended to two-track bridges
+BPM_PENALTY = 4         # seconds of cost per BPM of jump between neighbours
+CLASH_COST = 120        # seconds of cost for a join that is not harmonically compatible
+
+
+# --- Joins ---
+def _code_bpm(track):
+    return normalize_key(track.get('key', '')), float(track['bpm'])
+
+
+def _fits(code_a, bpm_a, code_b, bpm_b):
+    return keys_mix(code_a, code_b) and abs(bpm_a - bpm_b) <= BPM_WINDOW
+
+
+def compatible(a, b):
+    return _fits(*_code_bpm(a), *_code_bpm(b))
+
+
+def join_cost(a, b):
+    """Cost of mixing track a into track b; nothing if either side is missing."""
+    if a is None or b is None:
+        return 0
+    code_a, bpm_a = _code_bpm(a)
+    code_b, bpm_b = _code_bpm(b)
+    return BPM_PENALTY * abs(bpm_a - bpm_b) + (0 if _fits(code_a, bpm_a, code_b, bpm_b) else CLASH_COST)
+
+
+def _track_key(track):
+    return str(track.get('artist') or '').lower(), str(track.get('track_title') or '').lower()
+
+
+def _playtime(setlist, mix_ratio):
+    return sum(estimate_track_duration(t, mix_ratio) for t in setlist)
+
+
+# --- Bridge Search ---
+def bridge(library, left, right, gap, exclude=(), mix_ratio=DEFAULT_MIX_RATIO, max_tracks=MAX_BRIDGE):
+    """Up to `max_tracks` library tracks to play between `left` and `right`.
+
+    Candidates come from the library's HarmonicIndex around `left` (or
+    `right` when the gap is at the start of the set), capped at BRANCH per
+    step, so the search does not grow with the library. Chains are scored
+    on how close their playtime is to `gap` seconds plus their join costs.
+    Returns track dicts, or [] when leaving the gap beats every chain.
+    """
+    table, index = library.table, library.index
+    anchor = left if left is not None else right
+    if anchor is None or max_tracks < 1:
+        return []
+
+    def play(p):
+        return int((int(table.duration_s[p]) or DEFAULT_TRACK_SECONDS) * mix_ratio)
+
+    def usable(p):
+        artist, title = table.artist_id[p], table.title_id[p]
+        key = (table.artists[artist].lower() if artist >= 0 else "",
+               table.titles[title].lower() if title >= 0 else "")
+        return key not in exclude
+
+    def nearest(code, bpm):
+        if code < 0:
+            return []
+        found = index.lookup(key_name(code), bpm, BRIDGE_BPM_WINDOW)
+        found.sort(key=lambda p: abs(index.bpms[p] - bpm))
+        # Names are only checked for the closest few, not the whole window
+        return list(islice((p for p in found if usable(p)), BRANCH))
+
+    def cost_from(code, bpm, p):
+        return BPM_PENALTY * abs(bpm - index.bpms[p]) + (0 if _fits(code, bpm, index.key_codes[p], index.bpms[p]) else CLASH_COST)
+
+    left_code, left_bpm = _code_bpm(left) if left is not None else (None, None)
+    right_code, right_bpm = _code_bpm(right) if right is not None else (None, None)
+
+    def edge_in(p):
+        return cost_from(left_code, left_bpm, p) if left is not None else 0
+
+    def edge_out(p):
+        # Compatibility is symmetric, so p -> right costs the same as right -> p
+        return cost_from(right_code, right_bpm, p) if right is not None else 0
+
+    best_cost = abs(gap) + join_cost(left, right)
+    best = []
+    first = nearest(*_code_bpm(anchor))
+    for p in first:
+        cost = abs(gap - play(p)) + edge_in(p) + edge_out(p)
+        if cost < best_cost:
+            best_cost, best = cost, [p]
+
+    if max_tracks < 2:
+        return table.records(best) if best else []
+    # Two-track bridges grow from the first steps that join the anchor best
+    anchor_cost = edge_in if left is not None else edge_out
+    for p in heapq.nsmallest(EXPAND, first, key=anchor_cost):
+        head = anchor_cost(p)
+        for q in nearest(index.key_codes[p], index.bpms[p]):
+            if q == p:
+                continue
+            played = play(p) + play(q)
+            inner = cost_from(index.key_codes[p], index.bpms[p], q)
+            if left is not None:
+                cost = abs(gap - played) + head + inner + edge_out(q)
+                chain = [p, q]
+            else:
+                # Searching back from the first track: q plays before p
+                cost = abs(gap - played) + head + inner
+                chain = [q, p]
+            if cost < best_cost:
+                best_cost, best = cost, chain
+    return table.records(best) if best else []
+
+
+# --- Edits ---
+def remove_track(setlist, position, library, target_seconds=None, mix_ratio=DEFAULT_MIX_RATIO,
+                 max_bridge=MAX_BRIDGE):
+    """The set with the track at `position` removed and the gap repaired.
+
+    Only the slot between the removed track's neighbours changes. It is
+    filled with up to `max_bridge` library tracks when that keeps the
+    neighbours' mix and the playtime closer to `target_seconds` (or to the
+    removed track's playtime when no target is given). Tracks already in
+    the set are never reused.
+    """
+    setlist = list(setlist)
+    removed = setlist.pop(position)
+    if target_seconds is not None:
+        gap = target_seconds - _playtime(setlist, mix_ratio)
+    else:
+        gap = estimate_track_duration(removed, mix_ratio)
+    if gap <= 0 or not setlist:
+        return setlist
+
+    left = setlist[position - 1] if position > 0 else None
+    right = setlist[position] if position < len(setlist) else None
+    exclude = {_track_key(t) for t in setlist}
+    exclude.add(_track_key(removed))
+    setlist[position:position] = bridge(library, left, right, gap, exclude, mix_ratio, max_bridge)
+    return setlist
+
+
+def insert_track(setlist, track, target_seconds=None, mix_ratio=DEFAULT_MIX_RATIO, window=REPAIR_WINDOW):
+    """The set with `track` placed where it mixes best, and playtime held to target.
+
+    The slot is the one that adds the least join cost. If the set then
+    runs over `target_seconds`, tracks within `window` places of the new
+    one are dropped while that brings the playtime closer to the target
+    without adding clashes. Returns (setlist, position of the new track).
+    """
+    setlist = list(setlist)
+    costs = [
+        join_cost(setlist[p - 1] if p else None, track)
+        + join_cost(track, setlist[p] if p < len(setlist) else None)
+        - join_cost(setlist[p - 1] if p else None, setlist[p] if p < len(setlist) else None)
+        for p in range(len(setlist) + 1)
+    ]
+    position = min(range(len(costs)), key=costs.__getitem__)
+    setlist.insert(position, track)
+    if target_seconds is None:
+        return setlist, position
+
+    played = _playtime(setlist, mix_ratio)
+    while played > target_seconds:
+        best = None
+        for q in range(max(position - window, 0), min(position + window + 1, len(setlist))):
+            if q == position:
+                continue
+            prev = setlist[q - 1] if q else None
+            nxt = setlist[q + 1] if q + 1 < len(setlist) else None
+            duration = estimate_track_duration(setlist[q], mix_ratio)
+            change = join_cost(prev, nxt) - join_cost(prev, setlist[q]) - join_cost(setlist[q], nxt)
+            score = abs(played - duration - target_seconds) + max(change, 0)
+            if best is None or score < best[0]:
+                best = (score, q, duration)
+        if best is None or best[0] >= played - target_seconds:
+            break
+        _, q, duration = best
+        setlist.pop(q)
+        played -= duration
+        if q < position:
+            position -= 1
+    return setlist, position
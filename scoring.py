@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from core import JITTER, score_track
+from instrument import span
+from vibes import MAX_BPM, get_profile
+
+
+def uniform_array(size, low=0.0, high=JITTER, rng=random):
+    """`size` draws of rng.uniform(low, high) taken in one call.
+
+    NumPy's RandomState is the same Mersenne Twister as the random
+    module, so the generator state is handed over, drawn from, and
+    written back. The result is bit-for-bit what `size` sequential
+    rng.uniform calls would give, and rng is advanced the same way.
+    """
+    version, internal, gauss = rng.getstate()
+    mt = np.random.RandomState()
+    mt.set_state(("MT19937", np.array(internal[:-1], dtype=np.uint32), internal[-1]))
+    draws = mt.random_sample(size)
+    _, keys, pos = mt.get_state()[:3]
+    rng.setstate((version, tuple(int(k) for k in keys) + (int(pos),), gauss))
+    return low + (high - low) * draws
+
+
+def _bpm_points(bpm, profile):
+    table = np.asarray(profile.bpm_table, dtype=np.int64)
+    valid = (bpm >= 0) & (bpm <= MAX_BPM)
+    whole = np.floor(np.where(valid, bpm, 0))
+    slots = (2 * whole + (bpm != whole)).astype(np.int64)
+    return np.where(valid, table[slots], 0)
+
+
+def score_library(df, vibe, rng=random):
+    """Column-wise score_track for a whole DataFrame with bpm/genre columns.
+
+    Genre and artist rules run once per distinct value and are broadcast
+    back to the rows; excluded rows score 0 and draw no jitter, as in score_track.
+    """
+    with span("scoring") as stage:
+        stage.count("tracks", len(df))
+        return _score_library(df, vibe, rng)
+
+
+def _score_library(df, vibe, rng):
+    profile = get_profile(vibe)
+    bpm = df['bpm'].to_numpy(dtype=np.float64)
+
+    codes, uniques = pd.factorize(df['genre'])
+    excluded_by_genre = np.zeros(len(uniques) + 1, dtype=bool)
+    boost_by_genre = np.zeros(len(uniques) + 1, dtype=np.int64)
+    for g, raw in enumerate(uniques):
+        excluded_by_genre[g], boost_by_genre[g] = profile.genre_points(raw)
+    # Missing genres (code -1) land in the trailing slot: no exclusion, no boost
+
+    excluded = excluded_by_genre[codes]
+    if profile.exclude_artists and 'artist' in df:
+        artist_codes, artists = pd.factorize(df['artist'])
+        excluded_by_artist = np.array([profile.artist_excluded(a) for a in artists] + [False], dtype=bool)
+        excluded |= excluded_by_artist[artist_codes]
+    points = boost_by_genre[codes] + _bpm_points(bpm, profile)
+
+    scores = np.zeros(len(bpm), dtype=np.float64)
+    kept = ~excluded
+    scores[kept] = points[kept] + uniform_array(int(kept.sum()), rng=rng)
+    return scores
@@ -0,0 +1,192 @@
+import heapq
+import re
+import sqlite3
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import closing
+
+RESULT_CAP = 20     # matches returned per query
+MIN_PREFIX = 2      # shortest query word expanded as a prefix, as the FTS5 prefix index
+FUZZY_MIN = 0.4     # trigram (Dice) similarity for a misspelt word to count as a match
+FUZZY_TERMS = 5     # closest vocabulary words tried for a misspelt word
+
+# Weight of a query word matching a track word exactly, as a prefix, or
+# fuzzily (scaled by similarity); a track's score is the sum over words
+EXACT, PREFIX, FUZZY = 3.0, 2.0, 1.0
+
+WORD_PATTERN = re.compile(r"[^\W_]+")
+LAST_CHAR = chr(0x10FFFF)
+
+
+# --- Normalization ---
+def normalize(text):
+    """Casefolded text with accents removed ("Café" -> "cafe")."""
+    text = str(text)
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def words(text):
+    # Apostrophes are dropped first, so "Don't" is searched for as "dont"
+    return WORD_PATTERN.findall(normalize(text).replace("'", "").replace("\u2019", "")) if text else []
+
+
+def trigrams(word):
+    padded = f"^{word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# --- In-memory Index ---
+class SearchIndex:
+    """Ranked prefix and typo-tolerant search over track titles and artists.
+
+    postings:   word -> ascending track positions whose title or artist has it
+    vocabulary: every indexed word, sorted, so a prefix is one bisect range
+    entries:    position -> its words, to check the rest of a query's words
+                against the few tracks the rarest word leaves
+    Misspelt words are matched through a trigram index over the vocabulary,
+    which is far smaller than the library. Each distinct title and artist
+    string is tokenized once. Build one per library snapshot and reuse it.
+    """
+
+    def __init__(self, titles, artists):
+        tokenized = {}
+        postings = defaultdict(list)
+        self.entries = []
+        self._lengths = []
+        for p, (title, artist) in enumerate(zip(titles, artists)):
+            title_words = tokenized.get(title)
+            if title_words is None:
+                title_words = tokenized[title] = words(title)
+            artist_words = tokenized.get(artist)
+            if artist_words is None:
+                artist_words = tokenized[artist] = words(artist)
+            entry = set(title_words)
+            entry.update(artist_words)
+            for word in entry:
+                postings[word].append(p)
+            self.entries.append(entry)
+            self._lengths.append(len(title or ""))
+        self.postings = dict(postings)
+        self.vocabulary = sorted(self.postings)
+        self._grams = None  # built by the first query that needs typo matching
+
+    def _gram_index(self):
+        if self._grams is None:
+            grams = defaultdict(list)
+            for w, word in enumerate(self.vocabulary):
+                for gram in trigrams(word):
+                    grams[gram].append(w)
+            self._grams = dict(grams)
+        return self._grams
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def _fuzzy(self, word):
+        shared = Counter()
+        query = trigrams(word)
+        grams = self._gram_index()
+        for gram in query:
+            shared.update(grams.get(gram, ()))
+        scored = []
+        for w, count in shared.items():
+            candidate = self.vocabulary[w]
+            # A padded word of n letters has n trigrams
+            similarity = 2 * count / (len(query) + len(candidate))
+            if similarity >= FUZZY_MIN:
+                scored.append((similarity, candidate))
+        return heapq.nlargest(FUZZY_TERMS, scored)
+
+    def _terms(self, word, last):
+        """{indexed word: weight} that a query word can stand for."""
+        terms = {}
+        if word in self.postings:
+            terms[word] = EXACT
+        # The word still being typed, or an unknown one, may be a prefix
+        if (last or not terms) and len(word) >= MIN_PREFIX:
+            start = bisect_left(self.vocabulary, word)
+            end = bisect_left(self.vocabulary, word + LAST_CHAR, start)
+            for candidate in self.vocabulary[start:end]:
+                terms.setdefault(candidate, PREFIX)
+        if not terms:
+            for similarity, candidate in self._fuzzy(word):
+                terms[candidate] = FUZZY * similarity
+        return terms
+
+    def search(self, query, limit=RESULT_CAP):
+        """Positions of the best `limit` tracks matching every word of `query`.
+
+        Ranked by summed word weight, then shorter title, then library order.
+        """
+        query_words = words(query)
+        term_sets = [self._terms(word, i == len(query_words) - 1) for i, word in enumerate(query_words)]
+        if not term_sets or not all(term_sets):
+            return []
+
+        # Candidates come from the word with the fewest tracks; the other
+        # words are then checked against those tracks' own words
+        term_sets.sort(key=lambda terms: sum(len(self.postings[t]) for t in terms))
+        scores = {}
+        for term, weight in term_sets[0].items():
+            for p in self.postings[term]:
+                if scores.get(p, 0) < weight:
+                    scores[p] = weight
+        for terms in term_sets[1:]:
+            kept = {}
+            for p, score in scores.items():
+                best = max([terms.get(w, 0) for w in self.entries[p]])
+                if best:
+                    kept[p] = score + best
+            scores = kept
+            if not scores:
+                return []
+        return heapq.nsmallest(limit, scores, key=lambda p: (-scores[p], self._lengths[p], p))
+
+
+# --- Persistent FTS5 Index ---
+def fts_query(query):
+    """FTS5 MATCH expression requiring every word, the last one as a prefix; None if empty.
+
+    Split as words() splits, matching the apostrophe-free text the loader
+    indexes in track_search.
+    """
+    query_words = words(query)
+    if not query_words:
+        return None
+    return " ".join([f'"{w}"' for w in query_words[:-1]] + [f'"{query_words[-1]}"*'])
+
+
+def fts_search(conn, query, limit=RESULT_CAP):
+    """(rowid, track_title, artist) from the loader's track_search table, best first.
+
+    For processes without a loaded library; needs no index build.
+    """
+    match = fts_query(query)
+    if match is None:
+        return []
+    return conn.execute('''
+        SELECT t.rowid, t.track_title, t.artist
+        FROM track_search s JOIN tracks t ON t.rowid = s.rowid
+        WHERE track_search MATCH ?
+        ORDER BY s.rank
+        LIMIT ?
+    ''', (match, limit)).fetchall()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from core import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Search the library's titles and artists.")
+    parser.add_argument("query")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("-n", "--limit", type=int, default=RESULT_CAP)
+    args = parser.parse_args()
+    with closing(sqlite3.connect(args.db)) as conn:
+        for rowid, title, artist in fts_search(conn, args.query, args.limit):
+            print(f"{rowid:>7}  {title} — {artist}")
@@ -0,0 +1,441 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import queue
+import signal
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing, contextmanager, suppress
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from batch import Job, init_worker, plan_job, set_window
+from export import FORMATS, Playlist, clock, render, timeline
+from library import DB_PATH, load_library
+from optimizer import ENGINES
+from repair import insert_track, remove_track
+from search import RESULT_CAP
+from setlists import connect as connect_store
+from setlists import delete_setlist, load_setlist, open_store, save_setlist, setlist_names
+from transitions import fold, get_transition_store
+from vibes import get_profile
+from worker_pool import SharedTablePool
+
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_PENDING = 64         # generate requests running or queued before new ones get a 503
+STORE_CONNECTIONS = 4    # pooled SQLite connections for saving and loading setlists
+LATENCY_SAMPLES = 1024   # most recent requests per route kept for percentiles
+READ_TIMEOUT = 10        # seconds to receive a whole request
+MAX_BODY = 4 * 2**20
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# --- SQLite Connection Pool ---
+class ConnectionPool:
+    """A fixed set of setlist-store connections, each used by one thread at a time."""
+
+    def __init__(self, path=DB_PATH, size=STORE_CONNECTIONS):
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(connect_store(path, check_same_thread=False))
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        for _ in range(self.size):
+            self._idle.get().close()
+
+
+# --- Metrics ---
+def percentile(samples, q):
+    """Nearest-rank q-th percentile (0-100) of a non-empty sequence."""
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+class Metrics:
+    """Request counts, errors and recent latencies per route."""
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.started = time.time()
+        self.counts = Counter()
+        self.errors = Counter()
+        self.latencies = defaultdict(lambda: deque(maxlen=samples))
+
+    def record(self, route, seconds, status):
+        self.counts[route] += 1
+        if status >= 400:
+            self.errors[route] += 1
+        self.latencies[route].append(seconds)
+
+    def routes(self):
+        return {
+            route: {
+                "count": self.counts[route],
+                "errors": self.errors[route],
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            }
+            for route, samples in sorted(self.latencies.items())
+        }
+
+
+# --- Helpers ---
+def _json(payload, status=200):
+    return status, "application/json", json.dumps(payload).encode("utf-8")
+
+
+def _field(body, name):
+    if name not in body:
+        raise HTTPError(400, f"missing '{name}'")
+    return body[name]
+
+
+def _setlist(body):
+    setlist = _field(body, "setlist")
+    if not isinstance(setlist, list) or not all(isinstance(t, dict) for t in setlist):
+        raise HTTPError(400, "'setlist' must be a list of track objects")
+    return setlist
+
+
+def _pair(track):
+    # (artist, title) as the library's name_pairs compares them
+    return fold(track.get("artist")), fold(track.get("track_title"))
+
+
+def timed(start_time, setlist, mix_ratio):
+    """Copies of the tracks with the HH:MM each one starts at, as main.py prints them."""
+    return [dict(e.track, starts_at=clock(e.starts_at)) for e in timeline(Playlist("", setlist, start_time, mix_ratio))]
+
+
+async def read_request(reader):
+    """(method, path, parsed JSON body) for one HTTP/1.1 request.
+
+    A request without a body gets its query-string parameters instead.
+    """
+    line = await reader.readline()
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line") from None
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY:
+        raise HTTPError(413, f"body over {MAX_BODY} bytes")
+    body = {}
+    if length:
+        try:
+            body = json.loads(await reader.readexactly(length))
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON") from None
+        if not isinstance(body, dict):
+            raise HTTPError(400, "body must be a JSON object")
+    url = urlsplit(target)
+    return method.upper(), url.path, body or dict(parse_qsl(url.query))
+
+
+def _head(status, content_type, length):
+    return (
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {length}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode("latin-1")
+
+
+# --- Service ---
+class SetlistService:
+    """Warm library, worker pool and setlist store behind the HTTP routes.
+
+    The Library (TrackTable, HarmonicIndex, search index) comes from
+    library.load_library, so it is rebuilt only when the db file changes;
+    its table is placed in shared memory for a pool of planner processes,
+    each with its own transition cache. Generation runs in that pool and
+    store and repair work in threads, so the event loop only parses
+    requests and writes responses.
+    """
+
+    def __init__(self, path=DB_PATH, workers=None, max_pending=MAX_PENDING, store_connections=STORE_CONNECTIONS):
+        self.path = path
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.transitions = get_transition_store()
+        self.metrics = Metrics()
+        self.pending = 0
+        self.library = None
+        self._pool = None
+        self._names = None
+        self._swap_lock = asyncio.Lock()
+        # Legacy setlist files are migrated once, before the pool opens connections
+        with closing(open_store(path)):
+            pass
+        self.store = ConnectionPool(path, store_connections)
+        self.routes = {
+            "/health": {"GET": self.health},
+            "/metrics": {"GET": self.metrics_view},
+            "/generate": {"POST": self.generate},
+            "/repair": {"POST": self.repair},
+            "/export": {"POST": self.export},
+            "/search": {"GET": self.search},
+            "/setlists": {"GET": self.list_setlists},
+        }
+
+    # --- Warm State ---
+    async def current_library(self):
+        """(Library, worker pool) for the db as it is now; swaps in a new pool when it changed.
+
+        The two are swapped together, so a request that keeps using this
+        pair never sends one snapshot's positions to another's table.
+        """
+        library = await asyncio.to_thread(load_library, self.path)
+        if library is not self.library:
+            async with self._swap_lock:
+                if library is not self.library:
+                    self._swap(library)
+        return self.library, self._pool
+
+    def _swap(self, library):
+        old_pool = self._pool
+        self._pool = SharedTablePool(self.workers, library.table, init_worker, (self.transitions,))
+        self.library, self._names = library, None
+        if old_pool is not None:
+            # Jobs already running on the old table finish before it is freed
+            asyncio.get_running_loop().run_in_executor(None, old_pool.shutdown)
+
+    def _track(self, library, query):
+        """Library record for {"track_title", "artist"}, found by a hash lookup on the lowercased pair."""
+        if self._names is None or self._names[0] is not library:
+            names = {}
+            for p, pair in enumerate(library.table.name_pairs()):
+                names.setdefault(pair, p)
+            self._names = (library, names)
+        p = self._names[1].get(_pair(query))
+        if p is None:
+            raise HTTPError(404, f"'{query.get('track_title')}' by '{query.get('artist')}' is not in the library")
+        return library.table.records([p])[0]
+
+    def _with_store(self, fn, *args):
+        with self.store.connection() as conn:
+            return fn(conn, *args)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        self.store.close()
+
+    # --- Routes ---
+    async def health(self, body):
+        library, _ = await self.current_library()
+        return _json({"status": "ok", "tracks": len(library.df)})
+
+    async def metrics_view(self, body):
+        return _json({
+            "uptime_s": round(time.time() - self.metrics.started, 1),
+            "workers": self.workers,
+            "in_flight": self.pending,
+            "queue_depth": max(self.pending - self.workers, 0),
+            "max_pending": self.max_pending,
+            "library": {
+                "tracks": len(self.library.df) if self.library is not None else 0,
+                "load_seconds": round(self.library.load_seconds, 3) if self.library is not None else None,
+            },
+            "routes": self.metrics.routes(),
+        })
+
+    async def generate(self, body):
+        job = Job(
+            name=str(body.get("name") or "request"),
+            start=str(_field(body, "start")),
+            end=str(_field(body, "end")),
+            vibe=str(_field(body, "vibe")),
+            auto=body.get("segmentation", "auto") != "manual",
+            seed=int(body.get("seed", 0)),
+            engine=body.get("engine", "dp"),
+        )
+        try:
+            set_window(job)
+        except ValueError:
+            raise HTTPError(400, "'start' and 'end' must be HH:MM") from None
+        if job.engine != "dp" and job.engine not in ENGINES:
+            raise HTTPError(400, f"unknown engine '{job.engine}'; expected dp or one of: {', '.join(ENGINES)}")
+        if self.pending >= self.max_pending:
+            raise HTTPError(503, f"{self.pending} generate requests already pending")
+
+        self.pending += 1
+        try:
+            library, pool = await self.current_library()
+            positions = await asyncio.to_thread(library.candidate_positions, job.vibe)
+            future = pool.submit(plan_job, job, positions)
+            start_time, mix_ratio, setlist = await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            if self._pool is pool:
+                self.library = None  # a worker died; the next request starts a fresh pool
+            raise HTTPError(500, "a planner process exited; retry the request") from None
+        finally:
+            self.pending -= 1
+        return _json({"seed": job.seed, "mix_ratio": mix_ratio, "setlist": timed(start_time, setlist, mix_ratio)})
+
+    async def repair(self, body):
+        setlist = _setlist(body)
+        mix_ratio = get_profile(body.get("vibe", "")).mix_ratio
+        target = body.get("target_seconds")
+        library, _ = await self.current_library()
+        if "remove" in body:
+            position = int(body["remove"])
+            if not 0 <= position < len(setlist):
+                raise HTTPError(400, f"'remove' must be a position from 0 to {len(setlist) - 1}")
+            result = await asyncio.to_thread(remove_track, setlist, position, library, target, mix_ratio)
+            return _json({"setlist": result})
+        if "insert" in body:
+            track = self._track(library, body["insert"])
+            if _pair(track) in {_pair(t) for t in setlist}:
+                raise HTTPError(409, f"'{track['track_title']}' by '{track['artist']}' is already in the setlist")
+            result, position = await asyncio.to_thread(insert_track, setlist, track, target, mix_ratio)
+            return _json({"setlist": result, "position": position})
+        raise HTTPError(400, "repair needs 'remove' (a position) or 'insert' (a track_title and artist)")
+
+    async def export(self, body):
+        setlist = _setlist(body)
+        fmt = str(body.get("format", "csv")).lower()
+        if fmt not in FORMATS:
+            raise HTTPError(400, f"'format' must be one of {', '.join(FORMATS)}")
+        start_time = None
+        if "start" in body:
+            try:
+                start_time = datetime.strptime(str(body["start"]), "%H:%M")
+            except ValueError:
+                raise HTTPError(400, "'start' must be HH:MM") from None
+        # Without a start, each track's own starts_at (as /generate returns it) is used
+        playlist = Playlist(str(body.get("name") or "Setlist"), setlist, start_time, get_profile(body.get("vibe", "")).mix_ratio)
+        return 200, FORMATS[fmt][1], render([playlist], fmt)
+
+    async def search(self, body):
+        try:
+            limit = min(max(int(body.get("limit", RESULT_CAP)), 1), 10 * RESULT_CAP)
+        except ValueError:
+            raise HTTPError(400, "'limit' must be an integer") from None
+        library, _ = await self.current_library()
+        # The first search on a snapshot builds its index, so it runs off the loop
+        positions = await asyncio.to_thread(library.find, str(body.get("q", "")), limit)
+        return _json({"tracks": library.table.records(positions)})
+
+    async def list_setlists(self, body):
+        return _json({"setlists": await asyncio.to_thread(self._with_store, setlist_names)})
+
+    async def get_setlist(self, body, name):
+        setlist = await asyncio.to_thread(self._with_store, load_setlist, name)
+        if not setlist:
+            raise HTTPError(404, f"no setlist named '{name}'")
+        return _json({"name": name, "setlist": setlist})
+
+    async def put_setlist(self, body, name):
+        setlist = _setlist(body)
+        unmatched = await asyncio.to_thread(self._with_store, save_setlist, name, setlist)
+        return _json({"name": name, "tracks": len(setlist), "unmatched": unmatched})
+
+    async def delete_setlist(self, body, name):
+        await asyncio.to_thread(self._with_store, delete_setlist, name)
+        return _json({"name": name, "deleted": True})
+
+    # --- HTTP ---
+    def _route(self, method, path):
+        """(metrics label, handler, extra args) for a request."""
+        parts = [unquote(p) for p in path.strip("/").split("/")]
+        if len(parts) == 2 and parts[0] == "setlists" and parts[1]:
+            handlers = {"GET": self.get_setlist, "PUT": self.put_setlist, "DELETE": self.delete_setlist}
+            label, args = f"{method} /setlists/{{name}}", (parts[1],)
+        else:
+            handlers = self.routes.get("/" + "/".join(parts), {})
+            label, args = f"{method} /{'/'.join(parts)}", ()
+        if method not in handlers:
+            raise HTTPError(405 if handlers else 404, f"no route for {method} {path}")
+        return label, handlers[method], args
+
+    async def handle(self, reader, writer):
+        began = time.perf_counter()
+        route, status = "unmatched", 500
+        try:
+            try:
+                method, path, body = await asyncio.wait_for(read_request(reader), READ_TIMEOUT)
+                route, handler, args = self._route(method, path)
+                status, content_type, payload = await handler(body, *args)
+            except HTTPError as e:
+                status, content_type, payload = _json({"error": e.message}, e.status)
+            except (ValueError, TypeError, KeyError) as e:
+                status, content_type, payload = _json({"error": f"bad request: {e}"}, 400)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                raise
+            except Exception as e:  # keep serving; the client sees what failed
+                status, content_type, payload = _json({"error": f"{type(e).__name__}: {e}"}, 500)
+            writer.write(_head(status, content_type, len(payload)) + payload)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            status = 408
+        finally:
+            writer.close()
+            self.metrics.record(route, time.perf_counter() - began, status)
+
+
+async def serve(service, host=HOST, port=PORT):
+    await service.current_library()
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Serving {len(service.library.df)} tracks on http://{host}:{port} "
+          f"with {service.workers} planner process(es)")
+    # Stop cleanly on Ctrl-C or a service manager's SIGTERM, so the shared
+    # table is unlinked; a background job may have SIGINT ignored otherwise
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve setlist generation, repair and export over local HTTP.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("-j", "--workers", type=int, default=None, help="planner processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING,
+                        help="generate requests running or queued before new ones are refused")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(SetlistService(args.db, args.workers, args.max_pending), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
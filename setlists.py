@@ -0,0 +1,194 @@
+import math
+import os
+import sqlite3
+from contextlib import closing
+
+from library import DB_PATH
+from query import ensure_version
+
+LEGACY_PATHS = ("saved_setlists.csv", "saved_setlists.xlsx")
+TRACK_FIELDS = ("track_title", "artist", "bpm", "key", "genre")
+LOADED_FIELDS = (*TRACK_FIELDS, "time", "duration_s", "vibe_score")
+
+
+# --- Schema ---
+def ensure_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS setlists (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            saved_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_setlists_name ON setlists (name)")
+    # Saving a set writes this file too; the library cache follows tracks' own version
+    ensure_version(conn)
+
+    # Items point at tracks by rowid. The track fields are only filled in
+    # for songs that are not in the library (typed in by hand), so a saved
+    # set never copies library rows.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS setlist_items (
+            setlist_id INTEGER NOT NULL REFERENCES setlists (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            track_rowid INTEGER,
+            vibe_score REAL,
+            track_title TEXT,
+            artist TEXT,
+            bpm REAL,
+            key TEXT,
+            genre TEXT,
+            PRIMARY KEY (setlist_id, position)
+        ) WITHOUT ROWID
+    ''')
+
+    # Legacy CSV/XLSX files already copied in, so the migration runs once
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS setlist_migrations (
+            path TEXT PRIMARY KEY,
+            setlists INTEGER,
+            migrated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def connect(path=DB_PATH, check_same_thread=True):
+    # check_same_thread=False lets a pool hand the connection to one thread at a time
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA foreign_keys=ON")
+    ensure_schema(conn)
+    return conn
+
+
+# --- Helpers ---
+def _value(value):
+    # pandas hands back NaN for empty cells; store those as NULL
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def _resolve_rowids(conn, setlist):
+    """Library rowid for each track, matched on (track_title, artist); None if absent."""
+    pairs = [(_value(t.get("track_title")), _value(t.get("artist"))) for t in setlist]
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS setlist_lookup (track_title TEXT, artist TEXT)")
+    conn.execute("DELETE FROM setlist_lookup")
+    conn.executemany("INSERT INTO setlist_lookup VALUES (?, ?)", set(pairs))
+    found = dict(
+        ((title, artist), rowid)
+        for title, artist, rowid in conn.execute('''
+            SELECT l.track_title, l.artist, t.rowid
+            FROM setlist_lookup l
+            JOIN tracks t ON t.track_title = l.track_title AND t.artist = l.artist
+        ''')
+    )
+    return [found.get(pair) for pair in pairs]
+
+
+# --- Save / Load ---
+def save_setlist(conn, name, setlist):
+    """Store `setlist` (track dicts, in order) under `name`, replacing any set of that name.
+
+    Returns the number of tracks that were not in the library and were
+    stored with their own fields instead of a rowid.
+    """
+    rowids = _resolve_rowids(conn, setlist)
+    with conn:
+        conn.execute('''
+            INSERT INTO setlists (name) VALUES (?)
+            ON CONFLICT (name) DO UPDATE SET saved_at = CURRENT_TIMESTAMP
+        ''', (name,))
+        setlist_id = conn.execute("SELECT id FROM setlists WHERE name = ?", (name,)).fetchone()[0]
+        conn.execute("DELETE FROM setlist_items WHERE setlist_id = ?", (setlist_id,))
+
+        rows = []
+        for position, (track, rowid) in enumerate(zip(setlist, rowids)):
+            fields = [None] * len(TRACK_FIELDS) if rowid is not None else [_value(track.get(f)) for f in TRACK_FIELDS]
+            rows.append((setlist_id, position, rowid, _value(track.get("vibe_score")), *fields))
+        conn.executemany(
+            f"INSERT INTO setlist_items VALUES (?, ?, ?, ?, {', '.join('?' * len(TRACK_FIELDS))})",
+            rows,
+        )
+    return sum(rowid is None for rowid in rowids)
+
+
+def setlist_names(conn):
+    return [name for (name,) in conn.execute("SELECT name FROM setlists ORDER BY name")]
+
+
+def load_setlist(conn, name):
+    """Tracks of the set called `name`, in order, as dicts like the planner returns."""
+    # Library rows win over the item's own fields, which are only set for
+    # typed-in songs; tracks' bookkeeping columns are never read
+    columns = ", ".join(f"COALESCE(t.{f}, i.{f})" for f in TRACK_FIELDS)
+    cursor = conn.execute(f'''
+        SELECT {columns}, t.time, t.duration_s, i.vibe_score
+        FROM setlists s
+        JOIN setlist_items i ON i.setlist_id = s.id
+        LEFT JOIN tracks t ON t.rowid = i.track_rowid
+        WHERE s.name = ?
+        ORDER BY i.position
+    ''', (name,))
+    return [dict(zip(LOADED_FIELDS, row)) for row in cursor]
+
+
+def delete_setlist(conn, name):
+    with conn:
+        conn.execute("DELETE FROM setlists WHERE name = ?", (name,))
+
+
+# --- Legacy Migration ---
+def _read_legacy(path):
+    import pandas as pd
+
+    if path.endswith(".xlsx"):
+        try:
+            return pd.read_excel(path)
+        except ImportError:
+            return None  # openpyxl not installed; try again on a later run
+    return pd.read_csv(path)
+
+
+def migrate_legacy(conn, paths=LEGACY_PATHS):
+    """Copy sets from the old append-only CSV/XLSX files into the tables.
+
+    Each file is migrated once. Sets whose name is already stored are left
+    alone, so the CSV and its XLSX copy do not produce duplicates. Returns
+    {path: sets migrated} for the files handled on this call.
+    """
+    done = {path for (path,) in conn.execute("SELECT path FROM setlist_migrations")}
+    migrated = {}
+    for path in paths:
+        key = os.path.abspath(path)
+        if key in done or not os.path.exists(path):
+            continue
+        df = _read_legacy(path)
+        if df is None:
+            continue
+
+        existing = set(setlist_names(conn))
+        count = 0
+        if "name" in df.columns:
+            for name, rows in df.groupby("name", sort=False):
+                if name in existing:
+                    continue
+                save_setlist(conn, str(name), rows.drop(columns="name").to_dict("records"))
+                count += 1
+        with conn:
+            conn.execute("INSERT INTO setlist_migrations (path, setlists) VALUES (?, ?)", (key, count))
+        migrated[path] = count
+    return migrated
+
+
+def open_store(path=DB_PATH, legacy_paths=LEGACY_PATHS):
+    """Connection with the setlist tables in place and legacy files migrated."""
+    conn = connect(path)
+    migrate_legacy(conn, legacy_paths)
+    return conn
+
+
+if __name__ == "__main__":
+    with closing(open_store()) as conn:
+        names = setlist_names(conn)
+    print(f"{len(names)} saved setlist(s): {', '.join(names)}")
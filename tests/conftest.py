@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "data")]
+# Last, so benchmarks/scoring.py never shadows the root module
+sys.path.append(os.path.join(ROOT, "benchmarks"))
@@ -0,0 +1,29 @@
+import pytest
+
+from camelot import NO_KEY, encode, normalize_key
+
+
+@pytest.mark.parametrize("key, expected", [
+    ("8A", encode(8, "A")),
+    (" 8a ", encode(8, "A")),
+    ("1A", encode(1, "A")),
+    ("12B", encode(12, "B")),
+    ("Am", encode(8, "A")),
+    ("F#m", encode(11, "A")),
+    ("Abm", encode(1, "A")),
+    ("E♭m", encode(2, "A")),
+    ("C# minor", encode(12, "A")),
+    ("D min", encode(7, "A")),
+    ("Db major", encode(3, "B")),
+    ("Bb", encode(6, "B")),
+    ("F♯", encode(2, "B")),
+    ("G maj", encode(9, "B")),
+    ("C", encode(8, "B")),
+])
+def test_spellings(key, expected):
+    assert normalize_key(key) == expected
+
+
+@pytest.mark.parametrize("key", ["13A", "0A", "8C", "H", "Hm", "C##", "", "xyz", None])
+def test_rejected(key):
+    assert normalize_key(key) == NO_KEY
@@ -0,0 +1,22 @@
+from dataloader import detect_encoding, read_export_chunks
+
+HEADER = "Track Title\tArtist\tBPM\tKey\tGenre\tTime\n"
+
+
+def test_cp1252_byte_past_the_first_block(tmp_path):
+    path = tmp_path / "export.txt"
+    rows = "".join(f"Track {i}\tArtist\t124\t8A\tHouse\t3:30\n" for i in range(5000))
+    path.write_bytes((HEADER + rows).encode("utf-8") + "Café\tBeyoncé\t120\tAm\tPop\t4:00\n".encode("cp1252"))
+    assert path.stat().st_size > 64 * 1024
+
+    assert detect_encoding(path) == "windows-1252"
+    last = [row for chunk in read_export_chunks(path) for row in chunk][-1]
+    assert last[:2] == ("Café", "Beyoncé")
+
+
+def test_utf8_and_bom(tmp_path):
+    path = tmp_path / "export.txt"
+    path.write_text(HEADER + "Café\tBeyoncé\t120\t8A\tPop\t4:00\n", encoding="utf-8")
+    assert detect_encoding(path) == "utf-8"
+    path.write_text(HEADER, encoding="utf-16")
+    assert detect_encoding(path) == "utf-16"
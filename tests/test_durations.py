@@ -0,0 +1,16 @@
+import pytest
+
+from planner import estimate_track_duration
+from vibes import DEFAULT_TRACK_SECONDS
+
+
+@pytest.mark.parametrize("track, seconds", [
+    ({"duration_s": 200, "time": "9:99"}, 200),
+    ({"time": "3:45"}, 225),
+    ({"time": "1:02:10"}, 3730),
+    ({"duration_s": float("nan"), "time": "bad"}, DEFAULT_TRACK_SECONDS),
+    ({}, DEFAULT_TRACK_SECONDS),
+])
+def test_estimate_track_duration(track, seconds):
+    assert estimate_track_duration(track, 1.0) == seconds
+    assert estimate_track_duration(track, 0.5) == int(seconds * 0.5)
@@ -0,0 +1,23 @@
+import csv
+import io
+from datetime import datetime
+
+from export import Playlist, render
+
+
+def track(title, time="3:30"):
+    return {"track_title": title, "artist": "Artist", "bpm": 124.0, "key": "8A", "genre": "House", "time": time}
+
+
+def test_csv_names_each_playlist():
+    start = datetime(2026, 1, 1, 22, 0)
+    playlists = [
+        Playlist("friday", [track("One"), track("Two")], start, 1.0),
+        Playlist("saturday", [track("Three")], start, 1.0),
+    ]
+    rows = list(csv.DictReader(io.StringIO(render(playlists, "csv").decode("utf-8"))))
+    assert [(r["playlist"], r["position"], r["starts_at"], r["track_title"]) for r in rows] == [
+        ("friday", "1", "22:00", "One"),
+        ("friday", "2", "22:03", "Two"),
+        ("saturday", "1", "22:00", "Three"),
+    ]
@@ -0,0 +1,31 @@
+import sqlite3
+
+import pytest
+
+from genres import Taxonomy, default_taxonomy
+from query import genre_filter
+from vibes import get_profile
+
+
+def test_compound_genre_filed_under_longest_name():
+    taxonomy = default_taxonomy()
+    genre_id = taxonomy.id_for("Pop Rock")
+    assert taxonomy.names[taxonomy.family(genre_id)] == "rock"
+    assert taxonomy.lineage[genre_id] & taxonomy.mask(["pop"])
+
+
+@pytest.mark.parametrize("vibe", ["Sunset", "Frat Party", "Rave"])
+def test_compound_genre_excluded_by_either_family(vibe):
+    # Sunset and Rave exclude pop, Frat Party excludes rock
+    assert get_profile(vibe).genre_points("Pop Rock") == (True, 0)
+
+
+def test_stored_compound_genre_excluded():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE genres (genre_id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, parent_id INTEGER)")
+    conn.execute("INSERT INTO genres VALUES (500, 'pop rock', NULL)")
+    excluded, _ = genre_filter(conn, get_profile("Sunset"))
+    assert 500 in excluded
+
+    taxonomy = Taxonomy.from_rows([(500, "pop rock", None)])
+    assert taxonomy.names[taxonomy.parents[500]] == "rock"
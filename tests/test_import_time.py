@@ -0,0 +1,10 @@
+import pytest
+
+from import_time import BUDGETS_MS, check
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS_MS))
+def test_cli_imports_stay_light(module):
+    best_ms, heavy = check(module)
+    assert heavy == []
+    assert best_ms <= BUDGETS_MS[module]
@@ -0,0 +1,30 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from library import load_library
+from setlists import connect, save_setlist
+
+TRACKS = [("One", "Artist", 124.0, "8A", "House"), ("Two", "Artist", 125.0, "9A", "House")]
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "dj_tracks.db")
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("CREATE TABLE tracks (track_title TEXT, artist TEXT, bpm REAL, key TEXT, genre TEXT)")
+        conn.executemany("INSERT INTO tracks VALUES (?, ?, ?, ?, ?)", TRACKS)
+        conn.commit()
+    return path
+
+
+def test_saving_a_setlist_keeps_the_library(db):
+    with closing(connect(db)) as conn:
+        library = load_library(db)
+        save_setlist(conn, "friday", [{"track_title": "One", "artist": "Artist"}])
+        assert load_library(db) is library
+
+        conn.execute("INSERT INTO tracks VALUES ('Three', 'Artist', 126.0, '10A', 'House')")
+        conn.commit()
+        assert len(load_library(db).df) == 3
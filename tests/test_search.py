@@ -0,0 +1,41 @@
+import sqlite3
+
+import pytest
+
+from dataloader import ensure_search
+from search import SearchIndex, fts_search
+
+TRACKS = [
+    ("Don't Stop The Music", "Rihanna"),
+    ("Stop Me Now", "Queen"),
+    ("Dont Look Back", "Shonen Knife"),
+]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE tracks (track_title TEXT, artist TEXT)")
+    conn.executemany("INSERT INTO tracks VALUES (?, ?)", TRACKS[:1])
+    ensure_search(conn)  # built from existing rows, then kept in step by triggers
+    conn.executemany("INSERT INTO tracks VALUES (?, ?)", TRACKS[1:])
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'track_search'").fetchone() is None:
+        pytest.skip("SQLite built without FTS5")
+    return conn
+
+
+@pytest.mark.parametrize("query", ["dont stop", "don't stop", "Don’t Stop"])
+def test_apostrophes_in_memory(query):
+    index = SearchIndex([t for t, _ in TRACKS], [a for _, a in TRACKS])
+    assert index.search(query)[0] == 0
+
+
+@pytest.mark.parametrize("query", ["dont stop", "don't stop", "Don’t Stop"])
+def test_apostrophes_fts(conn, query):
+    assert [title for _, title, _ in fts_search(conn, query)] == ["Don't Stop The Music"]
+
+
+def test_fts_follows_updates(conn):
+    conn.execute("UPDATE tracks SET track_title = 'Don''t Look Back' WHERE track_title = 'Dont Look Back'")
+    conn.execute("DELETE FROM tracks WHERE artist = 'Rihanna'")
+    assert [title for _, title, _ in fts_search(conn, "dont")] == ["Don't Look Back"]
@@ -0,0 +1,24 @@
+import sqlite3
+from contextlib import closing
+
+from setlists import connect, load_setlist, save_setlist
+
+
+def test_loaded_tracks_carry_only_track_fields(tmp_path):
+    path = str(tmp_path / "dj_tracks.db")
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute('''
+            CREATE TABLE tracks (track_title TEXT, artist TEXT, bpm REAL, key TEXT, genre TEXT,
+                                 time TEXT, row_hash TEXT, duration_s INTEGER, camelot_num INTEGER)
+        ''')
+        conn.execute("INSERT INTO tracks VALUES ('One', 'Artist', 124.0, '8A', 'House', '3:30', 'abc', 210, 8)")
+        conn.commit()
+
+    typed_in = {"track_title": "Demo", "artist": "Friend", "bpm": 120, "key": "9A", "genre": "Pop", "vibe_score": 0.5}
+    with closing(connect(path)) as conn:
+        save_setlist(conn, "friday", [{"track_title": "One", "artist": "Artist", "vibe_score": 0.9}, typed_in])
+        one, demo = load_setlist(conn, "friday")
+
+    assert one == {"track_title": "One", "artist": "Artist", "bpm": 124.0, "key": "8A", "genre": "House",
+                   "time": "3:30", "duration_s": 210, "vibe_score": 0.9}
+    assert demo == {**typed_in, "bpm": 120.0, "time": None, "duration_s": None}
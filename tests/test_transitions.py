@@ -0,0 +1,58 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from transitions import TransitionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "song_transitions.db"
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("CREATE TABLE transitions (from_artist TEXT, from_title TEXT, to_artist TEXT, to_title TEXT)")
+        conn.executemany("INSERT INTO transitions VALUES (?, ?, ?, ?)", [
+            ("BEYONCÉ", "Cuff It", "Drake", "Passionfruit"),
+            ("Drake", "Passionfruit", "Rosalía", "DESPECHÁ"),
+        ])
+        conn.commit()
+    return TransitionStore(str(path))
+
+
+BEYONCE, DRAKE, ROSALIA = ("beyoncé", "cuff it"), ("drake", "passionfruit"), ("rosalía", "despechá")
+
+
+def test_non_ascii_names_match(store):
+    assert store.adjacency([BEYONCE, DRAKE, ROSALIA]) == {0: {1}, 1: {2}}
+
+
+def test_cached_per_source_track(store, monkeypatch):
+    store.adjacency([BEYONCE, DRAKE])
+    fetch = store._fetch
+    fetched = []
+    monkeypatch.setattr(store, "_fetch", lambda sources, *args: fetched.extend(sources) or fetch(sources, *args))
+
+    # The same tracks in another order, plus one new track: only that one is read
+    assert store.adjacency([ROSALIA, DRAKE, BEYONCE]) == {1: {0}, 2: {1}}
+    assert fetched == [ROSALIA]
+
+
+def test_copy_rebuilt_when_db_changes(store):
+    assert store.adjacency([DRAKE, BEYONCE]) == {1: {0}}
+    with closing(sqlite3.connect(store.path)) as conn:
+        conn.execute("INSERT INTO transitions VALUES ('Drake', 'PASSIONFRUIT', 'Beyoncé', 'Cuff It')")
+        conn.commit()
+    assert store.adjacency([DRAKE, BEYONCE]) == {0: {1}, 1: {0}}
+
+
+def test_missing_names_plan(store):
+    from candidates import setlist_objective
+    from planner import build_harmonic_graph_setlist
+
+    tracks = [
+        {"track_title": "Cuff It", "artist": "BEYONCÉ", "bpm": 115.0, "key": "8A", "vibe_score": 1.0, "duration_s": 200},
+        {"track_title": None, "artist": None, "bpm": 116.0, "key": "8A", "vibe_score": 1.0, "duration_s": 200},
+    ]
+    setlist = build_harmonic_graph_setlist(tracks, 400, False, store)
+    assert setlist
+    assert setlist_objective(tracks, 400, store) > 0
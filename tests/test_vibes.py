@@ -0,0 +1,35 @@
+import random
+
+import pandas as pd
+import pytest
+
+from core import score_track, score_tracks
+from scoring import score_library
+from vibes import get_profile
+
+TRACKS = [
+    {"track_title": "Timber", "artist": "Pitbull feat. Ke$ha", "bpm": 110.0, "genre": "Dance"},
+    {"track_title": "Red Lights", "artist": "Tiësto", "bpm": 110.0, "genre": "Dance"},
+    {"track_title": "Untitled", "artist": None, "bpm": 110.0, "genre": "Dance"},
+]
+
+
+@pytest.mark.parametrize("vibe, artist, excluded", [
+    ("Sunset", "Pitbull feat. Ke$ha", True),
+    ("Sunset", "TIËSTO", True),
+    ("Poolside", "Travis Scott", True),
+    ("Rave", "Demi Lovato", True),
+    ("Frat Party", "Pitbull", False),
+    ("Sunset", None, False),
+])
+def test_artist_exclusions(vibe, artist, excluded):
+    assert get_profile(vibe).artist_excluded(artist) is excluded
+
+
+def test_excluded_artists_score_zero_on_every_path():
+    assert [score_track(t, "Sunset") for t in TRACKS][:2] == [0, 0]
+
+    scored = score_tracks([dict(t) for t in TRACKS], "Sunset", random.Random(1))
+    library = score_library(pd.DataFrame(TRACKS), "Sunset", random.Random(1))
+    assert [t["vibe_score"] for t in scored] == list(library)
+    assert list(library[:2]) == [0, 0] and library[2] > 0
@@ -0,0 +1,248 @@
+import json
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from camelot import NO_KEY, decode, normalize_key
+from durations import parse_time
+from transitions import fold
+from vibes import DEFAULT_MIX_RATIO, DEFAULT_TRACK_SECONDS
+
+
+# Fixed column layout shared by shared-memory blocks and mmap files
+COLUMNS = [
+    ("bpm", np.float32),
+    ("key_code", np.int8),      # Camelot 1A..12B as 0..23, NO_KEY if unparseable
+    ("artist_id", np.int32),
+    ("title_id", np.int32),
+    ("genre_id", np.int32),     # -1 for a missing genre
+    ("vibe_score", np.float32),
+    ("duration_s", np.int32),   # full track length in seconds, 0 if unknown
+    ("row_id", np.int32),       # position in the library table this row came from
+]
+ALIGN = 8
+
+
+# Kept as track_table names; the parsing and its cache live in camelot.py
+encode_key = normalize_key
+decode_key = decode
+
+
+def _seconds(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):  # None or NaN
+        return 0
+
+
+def _intern(values):
+    pool, ids, seen = [], [], {}
+    for v in values:
+        if v is None or v != v:  # None or NaN
+            ids.append(-1)
+            continue
+        v = str(v)
+        i = seen.get(v)
+        if i is None:
+            i = seen[v] = len(pool)
+            pool.append(v)
+        ids.append(i)
+    return pool, np.asarray(ids, dtype=np.int32)
+
+
+def _layout(n):
+    offsets, offset = [], 0
+    for name, dtype in COLUMNS:
+        offsets.append((name, np.dtype(dtype).str, offset))
+        offset += -(-n * np.dtype(dtype).itemsize // ALIGN) * ALIGN
+    return offsets, max(offset, 1)
+
+
+# --- Track Table ---
+class TrackTable:
+    """Columnar, NumPy-backed view of the track library.
+
+    Strings are interned once into artist/title/genre pools and rows hold
+    small ints, so hot loops never touch per-track dicts. A table can be
+    exported to shared memory or an mmap file and attached elsewhere
+    without copying the columns.
+    """
+
+    def __init__(self, columns, artists, titles, genres, _buffer=None):
+        for name, dtype in COLUMNS:
+            setattr(self, name, columns[name])
+        self.artists = artists
+        self.titles = titles
+        self.genres = genres
+        self._buffer = _buffer  # keeps a SharedMemory/mmap alive while attached
+
+    def __len__(self):
+        return len(self.bpm)
+
+    # --- Construction ---
+    @classmethod
+    def from_columns(cls, titles, artists, bpms, keys, genres, vibe_scores=None, durations=None, times=None):
+        """Build a table from parallel columns.
+
+        Track length comes from `durations` (seconds) where given, else from
+        `times` ("mm:ss" strings).
+        """
+        n = len(bpms)
+        title_pool, title_ids = _intern(titles)
+        artist_pool, artist_ids = _intern(artists)
+        genre_pool, genre_ids = _intern(
+            None if g is None or g != g or not str(g).strip() else str(g).strip() for g in genres
+        )
+        columns = {
+            "bpm": np.asarray(bpms, dtype=np.float32),
+            "key_code": np.fromiter((encode_key(k) for k in keys), dtype=np.int8, count=n),
+            "artist_id": artist_ids,
+            "title_id": title_ids,
+            "genre_id": genre_ids,
+            "vibe_score": np.asarray(vibe_scores if vibe_scores is not None else np.zeros(n), dtype=np.float32),
+            "duration_s": np.zeros(n, dtype=np.int32),
+            "row_id": np.arange(n, dtype=np.int32),
+        }
+        if durations is not None:
+            columns["duration_s"] = np.fromiter((_seconds(d) for d in durations), dtype=np.int32, count=n)
+        if times is not None:
+            parsed = np.fromiter((parse_time(t) or 0 for t in times), dtype=np.int32, count=n)
+            columns["duration_s"] = np.where(columns["duration_s"] > 0, columns["duration_s"], parsed)
+        return cls(columns, artist_pool, title_pool, genre_pool)
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls.from_columns(
+            df['track_title'].tolist(),
+            df['artist'].tolist(),
+            df['bpm'].to_numpy(),
+            df['key'].tolist(),
+            df['genre'].tolist(),
+            df['vibe_score'].to_numpy() if 'vibe_score' in df else None,
+            df['duration_s'].tolist() if 'duration_s' in df else None,
+            df['time'].tolist() if 'time' in df else None,
+        )
+
+    @classmethod
+    def from_records(cls, records):
+        records = list(records)
+        return cls.from_columns(
+            [t['track_title'] for t in records],
+            [t['artist'] for t in records],
+            [t['bpm'] for t in records],
+            [t.get('key', '') for t in records],
+            [t.get('genre') for t in records],
+            [t.get('vibe_score', 0) for t in records],
+            [t.get('duration_s') for t in records],
+            [t.get('time') for t in records],
+        )
+
+    # --- Selection ---
+    def take(self, positions):
+        positions = np.asarray(positions, dtype=np.intp)
+        columns = {name: getattr(self, name)[positions] for name, _ in COLUMNS}
+        return TrackTable(columns, self.artists, self.titles, self.genres)
+
+    def with_scores(self, vibe_scores):
+        """Same rows with a new vibe_score column; other columns are shared."""
+        columns = {name: getattr(self, name) for name, _ in COLUMNS}
+        columns["vibe_score"] = np.asarray(vibe_scores, dtype=np.float32)
+        return TrackTable(columns, self.artists, self.titles, self.genres)
+
+    def candidate_positions(self):
+        return np.flatnonzero((self.vibe_score > 0) & (self.key_code != NO_KEY))
+
+    def camelot_nums(self):
+        return np.where(self.key_code >= 0, self.key_code // 2 + 1, 0)
+
+    def play_durations(self, ratio=DEFAULT_MIX_RATIO):
+        total = np.where(self.duration_s > 0, self.duration_s, DEFAULT_TRACK_SECONDS)
+        return (total * ratio).astype(np.int64)
+
+    def name_pairs(self):
+        artists = [fold(a) for a in self.artists]
+        titles = [fold(t) for t in self.titles]
+        return [
+            (artists[a] if a >= 0 else "", titles[t] if t >= 0 else "")
+            for a, t in zip(self.artist_id.tolist(), self.title_id.tolist())
+        ]
+
+    def records(self, positions=None):
+        """Plain dicts for display and editing; only call on small selections."""
+        rows = self if positions is None else self.take(positions)
+        result = []
+        for i in range(len(rows)):
+            code = decode_key(int(rows.key_code[i]))
+            genre_id = int(rows.genre_id[i])
+            duration_s = int(rows.duration_s[i])
+            record = {
+                "track_title": self.titles[rows.title_id[i]] if rows.title_id[i] >= 0 else "",
+                "artist": self.artists[rows.artist_id[i]] if rows.artist_id[i] >= 0 else "",
+                "bpm": round(float(rows.bpm[i]), 2),
+                "key": f"{code[0]}{code[1]}" if code else "",
+                "genre": self.genres[genre_id] if genre_id >= 0 else None,
+                "vibe_score": float(rows.vibe_score[i]),
+            }
+            if duration_s:
+                record["duration_s"] = duration_s
+                record["time"] = f"{duration_s // 60:02d}:{duration_s % 60:02d}"
+            result.append(record)
+        return result
+
+    # --- Zero-copy Export ---
+    def _handle(self):
+        offsets, size = _layout(len(self))
+        return dict(n=len(self), size=size, offsets=offsets,
+                    artists=self.artists, titles=self.titles, genres=self.genres)
+
+    def _write(self, buf, offsets):
+        for name, dtype, offset in offsets:
+            column = getattr(self, name)
+            np.ndarray(len(column), dtype=dtype, buffer=buf, offset=offset)[:] = column
+
+    @classmethod
+    def _view(cls, handle, buf, keep_alive):
+        columns = {
+            name: np.ndarray(handle["n"], dtype=dtype, buffer=buf, offset=offset)
+            for name, dtype, offset in handle["offsets"]
+        }
+        return cls(columns, handle["artists"], handle["titles"], handle["genres"], _buffer=keep_alive)
+
+    def to_shared_memory(self, name=None):
+        """Copy the columns into one SharedMemory block.
+
+        Returns (shm, handle). The handle is a small picklable dict; pass it
+        to TrackTable.attach in another process. The caller owns shm and
+        must close() and unlink() it when done.
+        """
+        handle = self._handle()
+        shm = shared_memory.SharedMemory(name=name, create=True, size=handle["size"])
+        self._write(shm.buf, handle["offsets"])
+        handle["shm_name"] = shm.name
+        return shm, handle
+
+    @classmethod
+    def attach(cls, handle):
+        try:
+            shm = shared_memory.SharedMemory(name=handle["shm_name"], track=False)
+        except TypeError:
+            # Before 3.13 there is no track flag. Pool workers share the
+            # creator's resource tracker, so registering again is harmless.
+            shm = shared_memory.SharedMemory(name=handle["shm_name"])
+        return cls._view(handle, shm.buf, shm)
+
+    def save(self, path):
+        """Write the columns to `path` and the string pools to `path`.json."""
+        handle = self._handle()
+        data = np.memmap(path, dtype=np.uint8, mode="w+", shape=(handle["size"],))
+        self._write(data, handle["offsets"])
+        data.flush()
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump(handle, f)
+
+    @classmethod
+    def open(cls, path):
+        with open(path + ".json", encoding="utf-8") as f:
+            handle = json.load(f)
+        data = np.memmap(path, dtype=np.uint8, mode="r", shape=(handle["size"],))
+        return cls._view(handle, data, data)
@@ -0,0 +1,193 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import closing
+from functools import lru_cache
+
+from instrument import span
+
+TRANSITIONS_DB_PATH = os.path.join("..", "transition_manager", "song_transitions.db")
+CACHE_SIZE = 20000  # source tracks whose recorded transitions are kept per process
+KEYS_SUFFIX = ".keys.db"  # folded, indexed copy of the transitions, next to the db
+
+
+def fold(text):
+    """A name as compared in (artist, title) pairs: lowercased, "" when missing (None or NaN)."""
+    return text.lower() if isinstance(text, str) else ""
+
+
+# --- Transition Store ---
+class TransitionStore:
+    """Lazy view of the recorded transitions table, cached per source track.
+
+    Nothing is read until a segment asks for its adjacency, and then only
+    transitions leaving its tracks that are not cached yet are fetched, in
+    one query. Every track's outgoing transitions stay cached, so
+    overlapping segments and repeated plans reuse them; the cache is
+    dropped when the db file changes.
+
+    Lookups run against a shadow copy (KEYS_SUFFIX) holding every
+    transition with its names folded by fold(), indexed on the source
+    pair. It is rebuilt once when the transitions db changes and shared
+    by every process.
+    """
+
+    def __init__(self, path=TRANSITIONS_DB_PATH, cache_size=CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (artist, title) -> frozenset of the pairs it leads into
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Worker processes get the path only and build their own cache
+        return {"path": self.path, "cache_size": self.cache_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["cache_size"])
+
+    def _current_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _keys_path(self):
+        if os.access(os.path.dirname(os.path.abspath(self.path)), os.W_OK):
+            return os.path.splitext(self.path)[0] + KEYS_SUFFIX
+        # A read-only db directory keeps its copy in the temp dir instead
+        digest = hashlib.blake2b(os.path.realpath(self.path).encode("utf-8"), digest_size=8).hexdigest()
+        return os.path.join(tempfile.gettempdir(), f"transitions-{digest}{KEYS_SUFFIX}")
+
+    def _open_keys(self, signature):
+        """Connection to the shadow copy, rebuilt first if it is older than `signature`."""
+        conn = sqlite3.connect(self._keys_path(), timeout=30, isolation_level=None)
+        try:
+            if _keys_signature(conn) != signature:
+                # One process rebuilds; the others wait here, then find it current
+                conn.execute("BEGIN IMMEDIATE")
+                if _keys_signature(conn) != signature:
+                    self._rebuild_keys(conn, signature)
+                conn.execute("COMMIT")
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _rebuild_keys(self, conn, signature):
+        conn.execute("DROP TABLE IF EXISTS transition_keys")
+        conn.execute("CREATE TABLE transition_keys (from_artist TEXT, from_title TEXT, to_artist TEXT, to_title TEXT)")
+        with closing(sqlite3.connect(self.path)) as source:
+            rows = source.execute("SELECT from_artist, from_title, to_artist, to_title FROM transitions")
+            conn.executemany(
+                "INSERT INTO transition_keys VALUES (?, ?, ?, ?)",
+                ((fold(a), fold(b), fold(c), fold(d)) for a, b, c, d in rows),
+            )
+        conn.execute("CREATE INDEX idx_transition_keys_from ON transition_keys (from_artist, from_title)")
+        conn.execute("CREATE TABLE IF NOT EXISTS keys_source (mtime_ns INTEGER, size INTEGER)")
+        conn.execute("DELETE FROM keys_source")
+        conn.execute("INSERT INTO keys_source VALUES (?, ?)", signature)
+
+    def adjacency(self, pairs):
+        """Recorded transitions among `pairs`, a list of lowercased (artist, title).
+
+        Returns {i: {j, ...}} over positions in `pairs`, meaning pairs[i] has
+        a recorded transition into pairs[j].
+        """
+        with span("transitions") as stage:
+            stage.count("tracks", len(pairs))
+            return self._adjacency(pairs, stage)
+
+    def _adjacency(self, pairs, stage):
+        signature = self._current_signature()
+        if signature is None:
+            return {}
+
+        positions = defaultdict(list)
+        for p, pair in enumerate(pairs):
+            positions[pair].append(p)
+
+        targets = {}
+        with self._lock:
+            if signature != self._signature:
+                self._cache.clear()
+                self._signature = signature
+            for pair in positions:
+                cached = self._cache.get(pair)
+                if cached is not None:
+                    self._cache.move_to_end(pair)
+                    targets[pair] = cached
+        stage.count("cache_hits", len(targets))
+
+        missing = [pair for pair in positions if pair not in targets]
+        if missing:
+            fetched = self._fetch(missing, signature, stage)
+            targets.update(fetched)
+            with self._lock:
+                self._cache.update(fetched)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        result = defaultdict(set)
+        for from_pair, to_pairs in targets.items():
+            for to_pair in to_pairs:
+                ends = positions.get(to_pair)
+                if ends:
+                    for i in positions[from_pair]:
+                        result[i].update(j for j in ends if j != i)
+        return dict(result)
+
+    def _fetch(self, sources, signature, stage):
+        """{source: frozenset of target pairs} for every pair in `sources`, read in one query."""
+        found = defaultdict(set)
+        with closing(self._open_keys(signature)) as conn:
+            conn.execute("CREATE TEMP TABLE segment_tracks (artist TEXT, title TEXT)")
+            conn.executemany("INSERT INTO segment_tracks VALUES (?, ?)", sources)
+            rows = conn.execute('''
+                SELECT k.from_artist, k.from_title, k.to_artist, k.to_title
+                FROM segment_tracks s
+                JOIN transition_keys k
+                  ON k.from_artist = s.artist
+                 AND k.from_title = s.title
+            ''').fetchall()
+        stage.count("rows_fetched", len(rows))
+        for from_artist, from_title, to_artist, to_title in rows:
+            found[(from_artist, from_title)].add((to_artist, to_title))
+        return {pair: frozenset(found.get(pair, ())) for pair in sources}
+
+
+def _keys_signature(conn):
+    try:
+        row = conn.execute("SELECT mtime_ns, size FROM keys_source").fetchone()
+    except sqlite3.OperationalError:
+        return None  # no copy built yet
+    return tuple(row) if row else None
+
+
+@lru_cache(maxsize=None)
+def get_transition_store(path=TRANSITIONS_DB_PATH):
+    """One shared store (and cache) per db path in this process."""
+    return TransitionStore(path)
+
+
+def transition_adjacency(transitions, pairs):
+    """Adjacency among `pairs` from a TransitionStore or a set of pair tuples."""
+    if not transitions:
+        return {}
+    if isinstance(transitions, TransitionStore):
+        return transitions.adjacency(pairs)
+
+    positions = defaultdict(list)
+    for p, pair in enumerate(pairs):
+        positions[pair].append(p)
+    result = defaultdict(set)
+    for from_pair, to_pair in transitions:
+        targets = positions.get(to_pair)
+        if targets:
+            for i in positions.get(from_pair, ()):
+                result[i].update(j for j in targets if j != i)
+    return dict(result)
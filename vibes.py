@@ -0,0 +1,124 @@
+import json
+import math
+import os
+from functools import lru_cache
+
+from genres import default_taxonomy
+from transitions import fold
+
+VIBES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vibes.json")
+MAX_BPM = 300
+DEFAULT_MIX_RATIO = 0.7  # share of each track played before mixing out
+DEFAULT_TRACK_SECONDS = 210  # length assumed for a track with no known time
+
+
+def normalize_vibe(name):
+    return " ".join(str(name).lower().split())
+
+
+# --- Compiled Vibe Profile ---
+class VibeProfile:
+    """One vibe from vibes.json, compiled for scoring.
+
+    Exclusions and boost groups name genres of the taxonomy in
+    genres.json; naming a family covers its sub-genres. They are compiled
+    to bitmasks over a taxonomy's ids and tested against each genre's
+    lineage mask. BPM bands become a table with one slot for each whole BPM
+    and one for the open interval after it, which is exact for inclusive
+    whole-number band edges. Artist exclusions match anywhere in the
+    case-folded artist, so "pitbull" also drops "Pitbull feat. Ne-Yo".
+    """
+
+    def __init__(self, name, label, exclude=(), boosts=(), bands=(), mix_ratio=DEFAULT_MIX_RATIO,
+                 exclude_artists=()):
+        self.name = name
+        self.label = label
+        self.mix_ratio = mix_ratio
+        self.exclude = tuple(exclude)
+        self.exclude_artists = tuple(fold(artist) for artist in exclude_artists)
+        self.boosts = tuple((tuple(b["terms"]), b["points"]) for b in boosts)
+        self.bands = tuple((band["min"], band["max"]) for band in bands)  # inclusive BPM ranges
+        self._default_rules = None
+        self._genre_cache = {}
+
+        self.bpm_table = [0] * (2 * MAX_BPM + 2)
+        for band in reversed(list(bands)):
+            low, high = band["min"], band["max"]
+            if low != int(low) or high != int(high):
+                raise ValueError(f"Vibe '{name}': BPM band edges must be whole numbers, got {low}-{high}")
+            for slot in range(2 * int(low), 2 * int(high) + 1):
+                self.bpm_table[slot] = band["points"]
+
+    def genre_rules(self, taxonomy):
+        """(excluded mask, [(boost mask, points)]) over `taxonomy`'s genre ids."""
+        return taxonomy.mask(self.exclude), [(taxonomy.mask(terms), points) for terms, points in self.boosts]
+
+    @staticmethod
+    def lineage_points(lineage, rules):
+        """(excluded, boost points) for a genre with `lineage` under compiled `rules`."""
+        excluded, boosts = rules
+        if lineage & excluded:
+            return True, 0
+        return False, sum(points for mask, points in boosts if lineage & mask)
+
+    def genre_points(self, genre):
+        """(excluded, boost points) for a raw genre string, through the configured taxonomy."""
+        cached = self._genre_cache.get(genre)
+        if cached is not None:
+            return cached
+
+        taxonomy = default_taxonomy()
+        if self._default_rules is None:
+            self._default_rules = self.genre_rules(taxonomy)
+        genre_id = taxonomy.id_for(genre)
+        result = (False, 0) if genre_id is None else self.lineage_points(taxonomy.lineage[genre_id], self._default_rules)
+        self._genre_cache[genre] = result
+        return result
+
+    def artist_excluded(self, artist):
+        folded = fold(artist)
+        return any(name in folded for name in self.exclude_artists)
+
+    def bpm_points(self, bpm):
+        if not 0 <= bpm <= MAX_BPM:
+            return 0
+        whole = math.floor(bpm)
+        return self.bpm_table[2 * whole + (bpm != whole)]
+
+
+EMPTY_PROFILE = VibeProfile("", "")
+
+
+# --- Registry ---
+@lru_cache(maxsize=None)
+def load_profiles(path=VIBES_PATH):
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+
+    profiles = {}
+    for name, spec in raw.items():
+        profile = VibeProfile(
+            normalize_vibe(name),
+            spec.get("label", name.title()),
+            exclude=spec.get("exclude", []),
+            boosts=spec.get("boosts", []),
+            bands=spec.get("bands", []),
+            mix_ratio=spec.get("mix_ratio", DEFAULT_MIX_RATIO),
+            exclude_artists=spec.get("exclude_artists", []),
+        )
+        profiles[profile.name] = profile
+        for alias in spec.get("aliases", []):
+            profiles.setdefault(normalize_vibe(alias), profile)
+    return profiles
+
+
+def get_profile(vibe, path=VIBES_PATH):
+    return load_profiles(path).get(normalize_vibe(vibe), EMPTY_PROFILE)
+
+
+def vibe_labels(path=VIBES_PATH):
+    seen = []
+    for profile in load_profiles(path).values():
+        if profile not in seen:
+            seen.append(profile)
+    return [p.label for p in seen]
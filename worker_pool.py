@@ -0,0 +1,44 @@
+# Process pools over one shared track list, for the best-of-k search, the
+# batch runner and the local service. A TrackTable is copied into shared
+# memory once and each worker attaches to it on start.
+from concurrent.futures import ProcessPoolExecutor
+
+from planner import is_table
+
+
+def _start_worker(initializer, tracks, *initargs):
+    if isinstance(tracks, dict):
+        # Shared-memory handle: attach to the parent's TrackTable columns
+        from track_table import TrackTable
+        tracks = TrackTable.attach(tracks)
+    initializer(tracks, *initargs)
+
+
+class SharedTablePool(ProcessPoolExecutor):
+    """ProcessPoolExecutor whose workers each run `initializer(tracks, *initargs)` once.
+
+    A TrackTable is shared rather than copied; a list of track dicts is
+    pickled once per worker, not per task. The shared block is freed on
+    shutdown, so shut down with wait=True (as `with` does) to let running
+    tasks finish first.
+    """
+
+    def __init__(self, max_workers, tracks, initializer, initargs=()):
+        self._shm = None
+        if is_table(tracks):
+            self._shm, tracks = tracks.to_shared_memory()
+        try:
+            super().__init__(max_workers, initializer=_start_worker, initargs=(initializer, tracks, *initargs))
+        except BaseException:
+            self._free()
+            raise
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        super().shutdown(wait=wait, cancel_futures=cancel_futures)
+        self._free()
+
+    def _free(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None